@@ -0,0 +1,146 @@
+"""
+Daily absence counts (how many people are away on each day) for the HR
+absence calendar.
+
+Counts come from difference arrays: every approved request adds +1 at its
+first day and -1 after its last day (clipped to the window), and a
+cumulative sum turns that into per-day headcount-away. That is
+O(requests + days) with NumPy, however long the requests are, instead of
+expanding every request into its days.
+
+Results are cached per window. A cached window is refreshed
+incrementally: only approvals changed since the last load are read and
+added (decisions are final, so approved requests never leave the set).
+After ABSENCE_CACHE_TTL seconds a window is rebuilt from scratch, which
+also picks up deleted users and hand edits. Approvals made in this process
+are added to every cached window right away (record_approval), so callers
+that accept slightly old data (max_age) can skip the refresh query.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+import numpy as np
+import repository
+
+ABSENCE_CACHE_TTL = int(os.getenv('ABSENCE_CACHE_TTL', 900))
+ABSENCE_CACHE_WINDOWS = int(os.getenv('ABSENCE_CACHE_WINDOWS', 16))
+ROLES = ('employee', 'hr')
+# Re-read this far behind the newest change seen, so approvals committed
+# out of updated_at order are not missed; already-counted ids are skipped
+_REFRESH_OVERLAP = timedelta(seconds=30)
+
+_windows = OrderedDict()  # (date_from, date_to) -> window state
+_lock = threading.Lock()
+
+
+def daily_counts(starts, ends, first_day, n_days, groups=None, n_groups=1):
+    """(n_groups, n_days) array: how many [start, end] intervals cover each day of the window.
+
+    ``starts``/``ends`` are epoch-day arrays and ``groups`` an optional
+    array of group indexes (default: everything in group 0).
+    """
+    starts = np.asarray(starts, dtype=np.int64) - first_day
+    ends = np.asarray(ends, dtype=np.int64) - first_day
+    groups = np.zeros(len(starts), dtype=np.int64) if groups is None else np.asarray(groups, dtype=np.int64)
+    inside = (ends >= 0) & (starts < n_days)
+    starts, ends, groups = starts[inside].clip(0, None), ends[inside].clip(None, n_days - 1), groups[inside]
+
+    diff = np.zeros((n_groups, n_days + 1), dtype=np.int64)
+    np.add.at(diff, (groups, starts), 1)
+    np.add.at(diff, (groups, ends + 1), -1)
+    return np.cumsum(diff[:, :n_days], axis=1)
+
+
+def _role_index(roles):
+    roles = np.asarray(roles, dtype=str)
+    index = np.zeros(len(roles), dtype=np.int64)
+    for g, role in enumerate(ROLES):
+        index[roles == role] = g
+    return index
+
+
+def _apply(window, rows):
+    """Add the intervals of rows not counted yet to a window's counts"""
+    if not rows:
+        return
+    ids, roles, starts, ends, updated = zip(*rows)
+    ids = np.asarray(ids, dtype=np.int64)
+    new = ~np.isin(ids, window['ids'])
+    if new.any():
+        window['counts'] += daily_counts(
+            np.asarray(starts)[new], np.asarray(ends)[new], window['first_day'], window['counts'].shape[1],
+            _role_index(np.asarray(roles)[new]), len(ROLES)
+        )
+        window['ids'] = np.union1d(window['ids'], ids[new])
+    window['watermark'] = max(filter(None, (window['watermark'], *updated)), default=None)
+
+
+def _load(date_from, date_to, load):
+    n_days = (date_to - date_from).days + 1
+    window = {
+        'first_day': repository.epoch_day(date_from),
+        'counts': np.zeros((len(ROLES), n_days), dtype=np.int64),
+        'ids': np.zeros(0, dtype=np.int64),
+        'watermark': None,
+        'loaded_at': time.monotonic(),
+        'refreshed_at': time.monotonic(),
+    }
+    _apply(window, load(date_from, date_to))
+    return window
+
+
+def absence_counts(date_from, date_to, max_age=0, load=None):
+    """{role: array of people away per day} for [date_from, date_to], from the window cache.
+
+    A window refreshed less than ``max_age`` seconds ago is returned without
+    asking the database. ``load`` replaces repository.load_approved_intervals
+    (same arguments and rows), e.g. to read more on the same connection.
+    """
+    load = load or repository.load_approved_intervals
+    key = (date_from, date_to)
+    with _lock:
+        window = _windows.get(key)
+        if window is not None:
+            _windows.move_to_end(key)
+    if window is not None and time.monotonic() - window['refreshed_at'] < max_age:
+        return {role: window['counts'][g] for g, role in enumerate(ROLES)}
+    if window is None or time.monotonic() - window['loaded_at'] > ABSENCE_CACHE_TTL:
+        window = _load(date_from, date_to, load)
+    else:
+        since = window['watermark'] - _REFRESH_OVERLAP if window['watermark'] else None
+        rows = load(date_from, date_to, updated_since=since)
+        # Copy before adding, so arrays already handed out stay unchanged
+        window = dict(window, counts=window['counts'].copy(), refreshed_at=time.monotonic())
+        _apply(window, rows)
+    with _lock:
+        _windows[key] = window
+        _windows.move_to_end(key)
+        while len(_windows) > ABSENCE_CACHE_WINDOWS:
+            _windows.popitem(last=False)
+    return {role: window['counts'][g] for g, role in enumerate(ROLES)}
+
+
+def record_approval(request):
+    """Add a request just approved in this process (id, role, start_date, end_date) to every
+    cached window, without a query.
+
+    The watermark is left alone: approvals from other processes made before
+    this one must still be picked up by the next refresh.
+    """
+    row = (request['id'], request['role'], repository.epoch_day(request['start_date']),
+           repository.epoch_day(request['end_date']), None)
+    with _lock:
+        for key, window in list(_windows.items()):
+            window = dict(window, counts=window['counts'].copy())
+            _apply(window, [row])
+            _windows[key] = window
+
+
+def mark_stale():
+    """Make the next read of every cached window refresh from the database (e.g. after bulk approvals)"""
+    with _lock:
+        for key, window in list(_windows.items()):
+            _windows[key] = dict(window, refreshed_at=float('-inf'))
@@ -0,0 +1,68 @@
+"""
+Move closed leave requests out of the hot leave_requests table.
+
+Approved and rejected requests that ended more than
+LEAVE_ARCHIVE_RETENTION_DAYS ago (default 730) are copied into the
+compressed leave_requests_archive table and deleted from leave_requests,
+a small batch per transaction with a pause in between, so no lock is held
+for long and replicas keep up. Employees still see archived requests in
+their leave status/history once they page back that far.
+
+Usage:
+    python archive_leave_requests.py
+    python archive_leave_requests.py --retention-days 365 --batch-size 1000 --pause-ms 200
+"""
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+
+import repository
+
+
+def archive(cutoff, batch_size=500, pause_ms=100, max_batches=None, progress=print):
+    """Archive in batches until nothing is left before ``cutoff``; returns rows moved"""
+    moved = 0
+    batches = 0
+    started = time.perf_counter()
+    while max_batches is None or batches < max_batches:
+        count = repository.archive_closed_requests(cutoff, batch_size)
+        moved += count
+        batches += 1
+        if count:
+            progress(f"… {moved:,} archived ({moved / max(time.perf_counter() - started, 1e-9):,.0f} rows/s)")
+        if count < batch_size:
+            break
+        time.sleep(pause_ms / 1000)
+    return moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--retention-days', type=int, default=repository.ARCHIVE_RETENTION_DAYS,
+                        help=f"keep requests that ended within this many days (default: "
+                             f"{repository.ARCHIVE_RETENTION_DAYS})")
+    parser.add_argument('--batch-size', type=int, default=500, help="rows per transaction (default: 500)")
+    parser.add_argument('--pause-ms', type=int, default=100, help="pause between batches (default: 100)")
+    parser.add_argument('--max-batches', type=int, help="stop after this many batches")
+    args = parser.parse_args()
+
+    if args.retention_days < repository.ARCHIVE_RETENTION_DAYS:
+        # The read path only looks in the archive past the configured horizon
+        print(f"❌ --retention-days must be at least LEAVE_ARCHIVE_RETENTION_DAYS "
+              f"({repository.ARCHIVE_RETENTION_DAYS}); raise that setting first")
+        return 2
+
+    cutoff = date.today() - timedelta(days=args.retention_days)
+    print(f"📦 Archiving approved/rejected requests that ended before {cutoff}...")
+    try:
+        moved = archive(cutoff, args.batch_size, args.pause_ms, args.max_batches)
+    except Exception as e:
+        print(f"❌ Archiving failed: {e}")
+        return 1
+    print(f"✅ Archived {moved:,} leave requests")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
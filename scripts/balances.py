@@ -0,0 +1,205 @@
+"""
+Leave balances: accrual, usage, carry-forward and what is left, per
+employee and leave type, for one year.
+
+The engine works on NumPy arrays for every employee at once: requests are
+turned into (employee, type) indexes and per-year day counts with array
+operations and summed with np.bincount, and carry-forward is a loop over
+the few years of history only, never over employees or requests. Days
+are working days of each employee's holiday region (holiday_calendar.py),
+counted per region with one vectorized prefix-sum lookup.
+
+Policies (days per year; env overrides):
+    annual  LEAVE_ANNUAL_DAYS (20), accrued monthly, up to
+            LEAVE_CARRY_FORWARD_MAX (5) unused days carried into next year
+    sick    LEAVE_SICK_DAYS (10), granted on Jan 1, not carried
+    casual  LEAVE_CASUAL_DAYS (6), accrued monthly, not carried
+Nothing accrues before the month a user joined (users.created_at); in the
+year they joined, Jan 1 grants are pro-rated to the months left.
+
+Usage:
+    python balances.py                       # this year, summary only
+    python balances.py --year 2025 -o balances_2025.csv
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from datetime import date
+
+import numpy as np
+import holiday_calendar
+import repository
+
+# leave_type -> (days per year, accrued monthly (else granted on Jan 1), max unused days carried forward)
+POLICIES = {
+    'annual': (float(os.getenv('LEAVE_ANNUAL_DAYS', 20)), True, float(os.getenv('LEAVE_CARRY_FORWARD_MAX', 5))),
+    'sick': (float(os.getenv('LEAVE_SICK_DAYS', 10)), False, 0.0),
+    'casual': (float(os.getenv('LEAVE_CASUAL_DAYS', 6)), True, 0.0),
+}
+LEAVE_TYPES = repository.LEAVE_TYPES
+# Carry-forward is followed back this many years before the one asked for
+HISTORY_YEARS = int(os.getenv('LEAVE_BALANCE_HISTORY_YEARS', 3))
+
+BALANCE_COLUMNS = ('accrued', 'carried', 'used', 'pending', 'remaining', 'available')
+# One row of repository.load_balance_inputs; dates are days since 1970-01-01
+REQUEST_DTYPE = np.dtype([('user_id', 'U50'), ('leave_type', 'U10'), ('status', 'U10'),
+                          ('start_day', 'i8'), ('end_day', 'i8')])
+
+
+def days_in_year(start, end, year, calendar):
+    """Working days of each [start, end] range (epoch-day arrays) that fall in ``year``"""
+    first, last = repository.epoch_day(date(year, 1, 1)), repository.epoch_day(date(year, 12, 31))
+    return calendar.count(np.maximum(start, first), np.minimum(end, last))
+
+
+def accrued_days(year, as_of, joined_year, joined_month):
+    """(users, leave types) array of days accrued in ``year`` as of ``as_of``.
+
+    ``joined_year``/``joined_month`` are per-user arrays (users.created_at):
+    nothing accrues before a user joined, and in the year they joined only
+    the months from the joining month on count (upfront grants included).
+    """
+    if year < as_of.year:
+        last_month = 12
+    elif year == as_of.year:
+        last_month = as_of.month
+    else:
+        last_month = 0
+    first_month = np.where(joined_year < year, 1, np.where(joined_year == year, joined_month, 13))
+    months = np.clip(last_month - first_month + 1, 0, None)
+    # Upfront grants cover the rest of the year, once its first month has started
+    grant_months = np.where(months > 0, 13 - first_month, 0)
+    return np.stack([
+        per_year * (months if monthly else grant_months) / 12
+        for per_year, monthly, _ in (POLICIES[t] for t in LEAVE_TYPES)
+    ], axis=-1)
+
+
+def compute_balances(users, requests, year, as_of=None):
+    """Balances of every user in ``users`` ([(user_id, holiday region, joined year,
+    joined month)], joined None if unknown) for ``year`` as of ``as_of`` (default today).
+
+    ``requests`` is [(user_id, leave_type, status, start_day, end_day)] of
+    approved and pending requests, days counted from 1970-01-01 (see
+    repository.load_balance_inputs).
+    Returns {'user_ids': array, 'leave_types': tuple, <column>: array} where
+    every column in BALANCE_COLUMNS is a (users, leave types) float array:
+    accrued this year, carried in from last year, used (approved),
+    pending, remaining (carried + accrued - used) and available
+    (remaining - pending).
+    """
+    as_of = as_of or date.today()
+    regions = np.array([user[1] or holiday_calendar.DEFAULT_REGION for user in users], dtype=str)
+    # Unknown joining dates count as joined long before the history window
+    joined_year = np.array([user[2] or 0 for user in users], dtype=np.int64)
+    joined_month = np.array([user[3] or 1 for user in users], dtype=np.int64)
+    users = np.array([user[0] for user in users], dtype=str)
+    n_users, n_types = len(users), len(LEAVE_TYPES)
+    years = range(year - HISTORY_YEARS, year + 1)
+
+    used = np.zeros((len(years), n_users, n_types))
+    pending = np.zeros((n_users, n_types))
+    if requests and n_users:
+        rows = np.array(requests, dtype=REQUEST_DTYPE)
+        # Array position of each request's user and type; rows of unknown users/types are dropped
+        order = np.argsort(users)
+        pos = np.searchsorted(users[order], rows['user_id'])
+        user_index = order[np.minimum(pos, n_users - 1)]
+        type_index = np.full(len(rows), -1)
+        for t, leave_type in enumerate(LEAVE_TYPES):
+            type_index[rows['leave_type'] == leave_type] = t
+        known = (users[user_index] == rows['user_id']) & (type_index >= 0)
+
+        cell = (user_index * n_types + type_index)[known]
+        starts, ends = rows['start_day'][known], rows['end_day'][known]
+        approved = rows['status'][known] == 'approved'
+        request_regions = regions[user_index][known]
+        by_region = [(holiday_calendar.calendar_for(region), request_regions == region)
+                     for region in np.unique(request_regions)]
+        for i, y in enumerate(years):
+            days = np.zeros(len(cell))
+            for calendar, in_region in by_region:
+                days[in_region] = days_in_year(starts[in_region], ends[in_region], y, calendar)
+            used[i] = np.bincount(cell, weights=days * approved, minlength=n_users * n_types).reshape(n_users, n_types)
+            if y == year:
+                pending = np.bincount(cell, weights=days * ~approved,
+                                      minlength=n_users * n_types).reshape(n_users, n_types)
+
+    caps = np.array([POLICIES[t][2] for t in LEAVE_TYPES])
+    carried = np.zeros((n_users, n_types))
+    for i, y in enumerate(years[:-1]):
+        carried = np.clip(carried + accrued_days(y, as_of, joined_year, joined_month) - used[i], 0, caps)
+
+    accrued = accrued_days(year, as_of, joined_year, joined_month)
+    remaining = carried + accrued - used[-1]
+    return {
+        'user_ids': users,
+        'leave_types': LEAVE_TYPES,
+        'accrued': accrued,
+        'carried': carried,
+        'used': used[-1],
+        'pending': pending,
+        'remaining': remaining,
+        'available': remaining - pending,
+    }
+
+
+def load_balances(year=None, user_id=None, as_of=None):
+    """Read the inputs from the database and compute balances (all users, or just ``user_id``)"""
+    as_of = as_of or date.today()
+    year = year or as_of.year
+    users, requests = repository.load_balance_inputs(year - HISTORY_YEARS, year, user_id=user_id)
+    return compute_balances(users, requests, year, as_of)
+
+
+def user_balance(user_id, year=None):
+    """{leave_type: {column: days}} for one employee"""
+    balances = load_balances(year, user_id=user_id)
+    return {
+        leave_type: {column: float(balances[column][0, t]) for column in BALANCE_COLUMNS}
+        for t, leave_type in enumerate(balances['leave_types'])
+    }
+
+
+def write_balances(balances, out):
+    """Write one CSV row per (user, leave type); returns the number of rows"""
+    writer = csv.writer(out)
+    writer.writerow(('user_id', 'leave_type') + BALANCE_COLUMNS)
+    count = 0
+    for u, user_id in enumerate(balances['user_ids']):
+        for t, leave_type in enumerate(balances['leave_types']):
+            writer.writerow([user_id, leave_type] + [f"{balances[c][u, t]:g}" for c in BALANCE_COLUMNS])
+            count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--year', type=int, default=date.today().year, help="balance year (default: this year)")
+    parser.add_argument('-o', '--output', help="write per-employee balances to this CSV file")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        balances = load_balances(args.year)
+    except Exception as e:
+        print(f"❌ Balance computation failed: {e}")
+        return 1
+    elapsed = time.perf_counter() - started
+
+    print(f"✅ Balances for {len(balances['user_ids']):,} employees ({args.year}) in {elapsed:.2f}s")
+    for t, leave_type in enumerate(balances['leave_types']):
+        overdrawn = int((balances['available'][:, t] < 0).sum())
+        print(f"   {leave_type:<7} used {balances['used'][:, t].sum():,.0f} days, "
+              f"{balances['remaining'][:, t].sum():,.0f} remaining, {overdrawn:,} employee(s) overdrawn")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8', newline='') as out:
+            rows = write_balances(balances, out)
+        print(f"📄 Wrote {rows:,} rows to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
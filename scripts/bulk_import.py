@@ -0,0 +1,328 @@
+"""
+Bulk import of employees (users) and historical leave requests.
+
+Rows are read and validated in a single streaming pass, inserted with
+batched multi-row INSERTs (or LOAD DATA LOCAL INFILE) and committed every
+--chunk-size rows. Invalid rows are written, with the reason, to a
+rejects file (JSONL) instead of stopping the import.
+
+Usage:
+    python bulk_import.py users employees.csv
+    python bulk_import.py leave leave_history.jsonl --chunk-size 10000
+    python bulk_import.py leave leave_history.csv --method load-data
+
+Columns
+    users: id, gmail, password, role (employee|hr), name
+    leave: user_id, start_date, end_date (YYYY-MM-DD), reason, status
+           (pending|approved|rejected, default approved), hr_comment,
+           created_at (optional), name (optional, defaults to the user's name)
+
+Before a leave import the file is pre-scanned for its earliest start_date
+and leave_requests gets year partitions back to that year.
+leave_summary is rebuilt once at the end of a leave import.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+import partitions
+import pymysql
+from db import get_db_config
+from repository import LEAVE_STATUSES, MAX_LEAVE_DAYS, rebuild_leave_summary
+
+EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+USER_COLUMNS = ('id', 'gmail', 'password', 'role', 'name')
+LEAVE_COLUMNS = ('user_id', 'name', 'start_date', 'end_date', 'reason', 'status', 'hr_comment', 'created_at')
+
+
+class RowError(ValueError):
+    """A row failed validation"""
+
+
+# ----------------------------------------------------------------- reading
+
+def read_rows(path, fmt=None):
+    """Yield (line_number, dict) from a CSV or JSONL file without loading it into memory"""
+    fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'jsonl':
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_no, {'__error__': f"invalid JSON: {e}"}
+                    continue
+                if not isinstance(row, dict):
+                    yield line_no, {'__error__': f"expected a JSON object, got {type(row).__name__}: {line[:100]}"}
+                    continue
+                yield line_no, row
+        else:
+            # Header is line 1, so data rows start at line 2
+            for line_no, row in enumerate(csv.DictReader(f), 2):
+                yield line_no, row
+
+
+# -------------------------------------------------------------- validation
+
+def _text(row, key, max_len, required=True, default=None):
+    value = row.get(key)
+    value = value.strip() if isinstance(value, str) else value
+    if value in (None, ''):
+        if required:
+            raise RowError(f"missing {key}")
+        return default
+    value = str(value)
+    if len(value) > max_len:
+        raise RowError(f"{key} longer than {max_len} characters")
+    return value
+
+
+def _date(row, key):
+    value = row.get(key)
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(str(value).strip(), '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise RowError(f"{key} must be YYYY-MM-DD, got {value!r}")
+
+
+def _first_start_year(path, fmt=None):
+    """Earliest start_date year in a leave file (rows that don't parse are skipped)"""
+    first_year = None
+    for _, row in read_rows(path, fmt):
+        try:
+            year = _date(row, 'start_date').year
+        except RowError:
+            continue
+        if first_year is None or year < first_year:
+            first_year = year
+    return first_year
+
+
+class UserValidator:
+    """Validates user rows against the file itself and the existing users table"""
+
+    columns = USER_COLUMNS
+    table = 'users'
+
+    def __init__(self, cursor):
+        cursor.execute("SELECT id, gmail FROM users")
+        self.ids = set()
+        self.gmails = set()
+        for row in cursor.fetchall():
+            self.ids.add(row['id'])
+            self.gmails.add(row['gmail'].lower())
+
+    def __call__(self, row):
+        user_id = _text(row, 'id', 50)
+        gmail = _text(row, 'gmail', 100)
+        if not EMAIL_RE.match(gmail):
+            raise RowError(f"invalid email {gmail!r}")
+        role = _text(row, 'role', 20).lower()
+        if role not in ('employee', 'hr'):
+            raise RowError(f"role must be employee or hr, got {role!r}")
+        values = (user_id, gmail, _text(row, 'password', 100), role, _text(row, 'name', 100))
+
+        if user_id in self.ids:
+            raise RowError(f"duplicate user id {user_id!r}")
+        if gmail.lower() in self.gmails:
+            raise RowError(f"duplicate email {gmail!r}")
+        self.ids.add(user_id)
+        self.gmails.add(gmail.lower())
+        return values
+
+
+class LeaveValidator:
+    """Validates leave rows; user_id must already exist in users (import users first)"""
+
+    columns = LEAVE_COLUMNS
+    table = 'leave_requests'
+
+    def __init__(self, cursor):
+        cursor.execute("SELECT id, name FROM users")
+        self.user_names = {row['id']: row['name'] for row in cursor.fetchall()}
+
+    def __call__(self, row):
+        user_id = _text(row, 'user_id', 50)
+        if user_id not in self.user_names:
+            raise RowError(f"unknown user_id {user_id!r}")
+        start_date = _date(row, 'start_date')
+        end_date = _date(row, 'end_date')
+        if end_date < start_date:
+            raise RowError("end_date is before start_date")
+        if (end_date - start_date).days + 1 > MAX_LEAVE_DAYS:
+            raise RowError(f"leave longer than {MAX_LEAVE_DAYS} days")
+        status = _text(row, 'status', 20, required=False, default='approved').lower()
+        if status not in LEAVE_STATUSES:
+            raise RowError(f"status must be one of {', '.join(LEAVE_STATUSES)}, got {status!r}")
+        created_at = _text(row, 'created_at', 32, required=False)
+        if created_at:
+            try:
+                created_at = datetime.fromisoformat(created_at.replace('T', ' '))
+            except ValueError:
+                raise RowError(f"invalid created_at {created_at!r}")
+        else:
+            created_at = datetime.combine(start_date, datetime.min.time())
+        return (
+            user_id,
+            _text(row, 'name', 100, required=False, default=self.user_names[user_id]),
+            start_date,
+            end_date,
+            _text(row, 'reason', 65535, required=False, default='Imported'),
+            status,
+            _text(row, 'hr_comment', 65535, required=False),
+            created_at,
+        )
+
+
+VALIDATORS = {'users': UserValidator, 'leave': LeaveValidator}
+
+
+# --------------------------------------------------------------- inserting
+
+def _insert_sql(validator):
+    columns = ', '.join(validator.columns)
+    placeholders = ', '.join(['%s'] * len(validator.columns))
+    return f"INSERT INTO {validator.table} ({columns}) VALUES ({placeholders})"
+
+
+def load_data(cursor, table, columns, rows):
+    """Write the rows to a temp CSV and LOAD DATA LOCAL INFILE it into ``table``.
+
+    The connection must be opened with local_infile=True. Every value is
+    enclosed in quotes and only None is written as a bare NULL, so a text
+    field that is literally "NULL" stays a string.
+    """
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, newline='', encoding='utf-8') as tmp:
+        for values in rows:
+            tmp.write(','.join('NULL' if v is None else '"' + str(v).replace('"', '""') + '"'
+                               for v in values) + '\n')
+        path = tmp.name
+    try:
+        cursor.execute(f"""
+            LOAD DATA LOCAL INFILE %s INTO TABLE {table}
+            CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+            LINES TERMINATED BY '\\n'
+            ({', '.join(columns)})
+        """, (path,))
+    finally:
+        os.unlink(path)
+
+
+def import_file(kind, path, fmt=None, chunk_size=5000, rejects_path=None, method='executemany',
+                progress=print):
+    """Import one file; returns {'read', 'inserted', 'rejected', 'seconds'}"""
+    rejects_path = rejects_path or f"{path}.rejects.jsonl"
+    conn = pymysql.connect(**get_db_config(local_infile=(method == 'load-data')))
+    stats = {'read': 0, 'inserted': 0, 'rejected': 0, 'seconds': 0.0}
+    started = time.perf_counter()
+    rejects = None
+
+    def reject(line_no, row, error):
+        nonlocal rejects
+        if rejects is None:
+            rejects = open(rejects_path, 'w', encoding='utf-8')
+        rejects.write(json.dumps({'line': line_no, 'error': error, 'row': row}, default=str) + '\n')
+        stats['rejected'] += 1
+
+    try:
+        with conn.cursor() as cursor:
+            validator = VALIDATORS[kind](cursor)
+            sql = _insert_sql(validator)
+            if kind == 'leave' and partitions.list_partitions(cursor):
+                # History older than the oldest partition would pile up in it; split
+                # before inserting since the DDL rebuilds the partition it splits
+                first_year = _first_start_year(path, fmt)
+                if first_year:
+                    added = partitions.ensure_past_partitions(cursor, first_year)
+                    if added:
+                        progress(f"… added partitions {', '.join(added)}")
+            chunk = []  # (line_no, raw row, values)
+
+            def flush():
+                if not chunk:
+                    return
+                try:
+                    values = [item[2] for item in chunk]
+                    if method == 'load-data':
+                        load_data(cursor, validator.table, validator.columns, values)
+                    else:
+                        cursor.executemany(sql, values)
+                    conn.commit()
+                    stats['inserted'] += len(chunk)
+                except pymysql.Error as e:
+                    # The whole chunk is rolled back; keep the rows so they can be fixed and re-run
+                    conn.rollback()
+                    for line_no, row, _ in chunk:
+                        reject(line_no, row, f"chunk failed: {e}")
+                chunk.clear()
+                elapsed = time.perf_counter() - started
+                progress(f"… {stats['read']:,} read, {stats['inserted']:,} inserted, "
+                         f"{stats['rejected']:,} rejected ({stats['read'] / max(elapsed, 1e-9):,.0f} rows/s)")
+
+            for line_no, row in read_rows(path, fmt):
+                stats['read'] += 1
+                if '__error__' in row:
+                    reject(line_no, None, row['__error__'])
+                    continue
+                try:
+                    chunk.append((line_no, row, validator(row)))
+                except RowError as e:
+                    reject(line_no, row, str(e))
+                    continue
+                if len(chunk) >= chunk_size:
+                    flush()
+            flush()
+
+            if kind == 'leave' and stats['inserted']:
+                # Bulk inserts bypass the incremental leave_summary updates
+                progress("… rebuilding leave_summary")
+                rebuild_leave_summary(cursor)
+                conn.commit()
+    finally:
+        conn.close()
+        if rejects is not None:
+            rejects.close()
+
+    stats['seconds'] = round(time.perf_counter() - started, 2)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('kind', choices=sorted(VALIDATORS))
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=('csv', 'jsonl'), help="default: from the file extension")
+    parser.add_argument('--chunk-size', type=int, default=5000, help="rows per commit (default: 5000)")
+    parser.add_argument('--rejects', help="where to write rejected rows (default: <path>.rejects.jsonl)")
+    parser.add_argument('--method', choices=('executemany', 'load-data'), default='executemany')
+    args = parser.parse_args()
+
+    print(f"📥 Importing {args.kind} from {args.path}...")
+    try:
+        stats = import_file(args.kind, args.path, args.format, args.chunk_size, args.rejects, args.method)
+    except Exception as e:
+        print(f"❌ Import failed: {e}")
+        return 1
+
+    rate = stats['inserted'] / stats['seconds'] if stats['seconds'] else 0
+    print(f"\n✅ Inserted {stats['inserted']:,} of {stats['read']:,} rows in {stats['seconds']}s ({rate:,.0f} rows/s)")
+    if stats['rejected']:
+        print(f"⚠️ {stats['rejected']:,} rows rejected, see {args.rejects or args.path + '.rejects.jsonl'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
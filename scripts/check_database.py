@@ -2,19 +2,11 @@
 Script to check the database structure and contents of the leave_requests table.
 """
 import pymysql
-from dotenv import load_dotenv
-import os
+from db import get_db_config
 
 def connect_db():
     """Create a database connection"""
-    load_dotenv()
-    return pymysql.connect(
-        host=os.getenv('DB_HOST', 'localhost'),
-        user=os.getenv('DB_USER', 'root'),
-        password=os.getenv('DB_PASSWORD', ''),
-        database=os.getenv('DB_NAME', 'hrms'),
-        cursorclass=pymysql.cursors.DictCursor
-    )
+    return pymysql.connect(**get_db_config())
 
 def check_database():
     """Check the database structure and contents"""
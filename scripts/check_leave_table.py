@@ -2,19 +2,11 @@
 Diagnostic script to check the leave_requests table structure and sample data.
 """
 import pymysql
-from dotenv import load_dotenv
-import os
+from db import get_db_config
 
 def connect_db():
     """Create a database connection"""
-    load_dotenv()
-    return pymysql.connect(
-        host=os.getenv('DB_HOST', 'localhost'),
-        user=os.getenv('DB_USER', 'root'),
-        password=os.getenv('DB_PASSWORD', ''),
-        database=os.getenv('DB_NAME', 'hrms'),
-        cursorclass=pymysql.cursors.DictCursor
-    )
+    return pymysql.connect(**get_db_config())
 
 def check_table_structure():
     """Check the structure of the leave_requests table"""
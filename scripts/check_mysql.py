@@ -1,20 +1,10 @@
 import pymysql
-from dotenv import load_dotenv
-import os
+from db import get_db_config
 
 def test_mysql_connection():
     try:
-        # Load environment variables
-        load_dotenv()
-        
         # Database configuration
-        db_config = {
-            'host': os.getenv('DB_HOST', 'localhost'),
-            'user': os.getenv('DB_USER', 'root'),
-            'password': os.getenv('DB_PASSWORD', 'mukulinblr#123'),
-            'port': 3306,  # Default MySQL port
-            'connect_timeout': 5  # 5 seconds timeout
-        }
+        db_config = get_db_config(database=False, cursorclass=pymysql.cursors.Cursor, connect_timeout=5)
         
         print("Testing MySQL connection with these settings:")
         print(f"Host: {db_config['host']}")
@@ -0,0 +1,314 @@
+"""
+Query-count budget check for every Streamlit page.
+
+Renders each page headlessly with a stub `streamlit` module (no browser, no
+server), counts the SQL statements and pooled-connection checkouts it
+issues and fails when a page goes over its declared budget. A new N+1 loop
+or an extra round trip per rerun shows up here as a failure.
+
+The submit scenario inserts a real leave request, so run it against a
+local, seeded database (never production); --seed requires SCRATCH_DB (see
+check_query_plans.seed):
+    SCRATCH_DB=hr_scratch DB_NAME=hr_scratch python check_query_budgets.py --seed 5000
+    python check_query_budgets.py -v          # list the statements of every page
+
+Exit code is 0 when every page is within budget and 1 otherwise.
+"""
+import argparse
+import os
+import runpy
+import sys
+import types
+from datetime import date, timedelta
+
+# Budgets: label -> (max statements, max connection checkouts) for one rerun.
+# Raise a budget only together with the change that needs it.
+BUDGETS = {
+    'approve_leave_page (pending tab)': (5, 3),
+    'approve_leave_page (approved tab)': (2, 1),
+    'employee_details_page': (1, 1),
+    'show_leave_status': (1, 1),
+    'request_leave_page': (1, 1),
+    'request_leave_page (submit)': (4, 1),
+    'overlap_report_page': (1, 1),
+    'absence_calendar_page': (1, 1),
+    'employee_leave_page (dashboard)': (4, 3),
+    'main.py: login': (1, 1),
+    'main.py: signup': (1, 1),
+    'main.py: HR home': (4, 3),
+    'main.py: employee home': (4, 3),
+}
+
+
+# ------------------------------------------------------------ stub streamlit
+
+class Rerun(BaseException):
+    """Raised by the stub st.rerun()/st.stop(); like Streamlit's own, it is not an Exception
+    so the pages' ``except Exception`` blocks let it through"""
+
+
+class SessionState(dict):
+    """dict with attribute access, like st.session_state"""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+    def __delattr__(self, name):
+        try:
+            del self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class Element:
+    """Containers (columns, forms, expanders, sidebar, ...) forward every call to the stub"""
+
+    def __init__(self, st):
+        self._st = st
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __getattr__(self, name):
+        return getattr(self._st, name)
+
+
+class StubStreamlit(types.ModuleType):
+    """Just enough of the streamlit API to run the pages without a browser.
+
+    ``inputs`` maps a widget key (or label) to the value it returns and
+    ``pressed`` holds the keys/labels of buttons that count as clicked.
+    """
+
+    def __init__(self):
+        super().__init__('streamlit')
+        self.reset()
+
+    def reset(self, session=None, inputs=None, pressed=()):
+        self.session_state = SessionState(session or {})
+        self.inputs = dict(inputs or {})
+        self.pressed = set(pressed)
+        self.errors = []
+        self.sidebar = Element(self)
+
+    def __getattr__(self, name):
+        # Any output call we don't model (markdown, metric, toast, ...) is a no-op
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: Element(self)
+
+    def _value(self, label, key, default):
+        value = self.inputs.get(key, self.inputs.get(label, default))
+        if key is not None:
+            self.session_state.setdefault(key, value)
+            value = self.session_state[key]
+        return value
+
+    def error(self, body, *args, **kwargs):
+        self.errors.append(str(body))
+        return Element(self)
+
+    def exception(self, exc, *args, **kwargs):
+        self.errors.append(repr(exc))
+        return Element(self)
+
+    def rerun(self, *args, **kwargs):
+        raise Rerun()
+
+    stop = rerun
+
+    def columns(self, spec, *args, **kwargs):
+        return [Element(self) for _ in range(spec if isinstance(spec, int) else len(spec))]
+
+    def tabs(self, labels, *args, **kwargs):
+        return [Element(self) for _ in labels]
+
+    def button(self, label, key=None, *args, **kwargs):
+        return not kwargs.get('disabled') and (label in self.pressed or key in self.pressed)
+
+    def form_submit_button(self, label='Submit', *args, **kwargs):
+        return label in self.pressed
+
+    def text_input(self, label, value='', key=None, *args, **kwargs):
+        return self._value(label, key, value)
+
+    text_area = text_input
+
+    def number_input(self, label, min_value=None, max_value=None, value=0, *args, key=None, **kwargs):
+        return self._value(label, key, value)
+
+    def checkbox(self, label, value=False, key=None, *args, **kwargs):
+        return self._value(label, key, value)
+
+    def selectbox(self, label, options, index=0, *args, key=None, **kwargs):
+        options = list(options)
+        return self._value(label, key, options[index] if options else None)
+
+    radio = selectbox
+
+    def multiselect(self, label, options, default=None, *args, key=None, **kwargs):
+        return self._value(label, key, list(default or []))
+
+    def date_input(self, label, value=None, min_value=None, *args, key=None, **kwargs):
+        return self._value(label, key, value or min_value or date.today())
+
+
+def install_stub():
+    """Register the stub as `streamlit` (and `streamlit_option_menu`) before any page is imported"""
+    st = StubStreamlit()
+    sys.modules['streamlit'] = st
+    option_menu = types.ModuleType('streamlit_option_menu')
+    option_menu.option_menu = lambda menu_title, options, *args, default_index=0, **kwargs: \
+        st.inputs.get('option_menu', options[default_index])
+    sys.modules['streamlit_option_menu'] = option_menu
+    return st
+
+
+# ----------------------------------------------------------------- scenarios
+
+def scenarios(hr, employee):
+    """(label, session_state, inputs, pressed buttons, callable) for every page we budget"""
+    import leave_employee
+    import leave_hr
+
+    hr_session = {'logged_in': True, 'user_id': hr['id'], 'user_role': 'hr', 'user_name': hr['name']}
+    emp_session = {'logged_in': True, 'user_id': employee['id'], 'user_role': 'employee',
+                   'user_name': employee['name']}
+    main_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+
+    def run_main():
+        runpy.run_path(main_py, run_name='__main__')
+
+    return [
+        ('approve_leave_page (pending tab)', hr_session, {}, (), leave_hr.approve_leave_page),
+        ('approve_leave_page (approved tab)', dict(hr_session, leave_tab='approved'), {}, (),
+         leave_hr.approve_leave_page),
+        ('employee_details_page', hr_session, {}, (), leave_hr.employee_details_page),
+        ('show_leave_status', emp_session, {}, (), lambda: leave_employee.show_leave_status(employee['id'])),
+        ('request_leave_page', emp_session, {}, (), leave_employee.request_leave_page),
+        ('request_leave_page (submit)', emp_session,
+         {'Reason': 'Query budget check', 'From Date': employee['free_date'], 'To Date': employee['free_date']},
+         ('Submit Request',), leave_employee.request_leave_page),
+        ('overlap_report_page', hr_session, {}, ('overlap_report_run',), leave_hr.overlap_report_page),
+        ('absence_calendar_page', hr_session, {'absence_by_role': True}, (), leave_hr.absence_calendar_page),
+        ('employee_leave_page (dashboard)', emp_session, {}, (), leave_employee.employee_leave_page),
+        ('main.py: login', {'show_login': True},
+         {'login_id': employee['id'], 'login_pass': employee['password']}, ('Submit',), run_main),
+        ('main.py: signup', {},
+         {'signup_id': 'budget-check', 'signup_gmail': 'budget-check@example.com', 'signup_pass': 'x',
+          'confirm_pass': 'x', 'Full Name': 'Budget Check'}, ('Sign Up',), run_main),
+        ('main.py: HR home', hr_session, {}, (), run_main),
+        ('main.py: employee home', emp_session, {}, (), run_main),
+    ]
+
+
+def checkouts():
+    import db
+    pools = {id(db.get_pool(role)): db.get_pool(role) for role in ('primary', 'replica')}
+    return sum(pool.stats()['checkouts'] for pool in pools.values())
+
+
+def run_scenario(st, session, inputs, pressed, call):
+    """Render one page; returns (statements, connection checkouts, st.error messages)"""
+    import query_log
+    st.reset(session, inputs, pressed)
+    before = checkouts()
+    with query_log.capture() as statements:
+        try:
+            call()
+        except Rerun:
+            pass
+    return list(statements), checkouts() - before, st.errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seed', type=int, metavar='ROWS',
+                        help="first insert this many synthetic leave requests (test databases only)")
+    parser.add_argument('-v', '--verbose', action='store_true', help="print every statement issued")
+    args = parser.parse_args()
+
+    st = install_stub()
+    import holiday_calendar
+    import otp_utils
+    import query_log
+    import repository
+    from check_query_plans import seed
+
+    # Signup must not send real email
+    otp_utils.send_otp_email = lambda receiver_email, otp: True
+
+    if args.seed:
+        import pymysql
+        from db import get_db_config
+        conn = pymysql.connect(**get_db_config())
+        try:
+            seed(conn, args.seed)
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            return 1
+        finally:
+            conn.close()
+        repository.rebuild_leave_summary()
+
+    import db
+    conn = db.connect_db()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id, name, password FROM users WHERE role = 'hr' ORDER BY id LIMIT 1")
+            hr = cur.fetchone()
+            cur.execute("SELECT id, name, password FROM users WHERE role = 'employee' ORDER BY id LIMIT 1")
+            employee = cur.fetchone()
+            if employee:
+                # A day after all of the employee's leave, so the submit scenario never hits the overlap check
+                cur.execute("""
+                    SELECT GREATEST(CURDATE(), COALESCE(MAX(end_date), CURDATE())) + INTERVAL 1 DAY AS free_date
+                    FROM leave_requests WHERE user_id = %s
+                """, (employee['id'],))
+                employee['free_date'] = cur.fetchone()['free_date']
+    finally:
+        conn.close()
+    if employee:
+        # ...and a working day, since leave of weekends/holidays only is refused
+        while not holiday_calendar.working_days(employee['free_date'], employee['free_date']):
+            employee['free_date'] += timedelta(days=1)
+    if not hr or not employee:
+        print("❌ Need at least one HR user and one employee; seed the database first (--seed)")
+        return 1
+
+    failures = 0
+    for label, session, inputs, pressed, call in scenarios(hr, employee):
+        max_queries, max_connections = BUDGETS[label]
+        statements, connections, errors = run_scenario(st, session, inputs, pressed, call)
+        over = len(statements) > max_queries or connections > max_connections
+        line = (f"{label}: {len(statements)}/{max_queries} queries, "
+                f"{connections}/{max_connections} connections")
+        if over or errors:
+            failures += 1
+            print(f"❌ {line}")
+            for message in errors:
+                print(f"   page error: {message}")
+        else:
+            print(f"✅ {line}")
+        if over or args.verbose:
+            for sql, _ in statements:
+                print(f"   {query_log.fingerprint(sql)}")
+
+    if failures:
+        print(f"\n❌ {failures} page(s) over budget or failing")
+        return 1
+    print("\n✅ Every page is within its query budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+"""
+Query-plan regression check for the hot leave/user queries.
+
+Runs the repository calls behind show_leave_requests, show_leave_status,
+employee_details_page, login_user and signup_user, captures the SQL they
+issue and runs EXPLAIN FORMAT=JSON on each statement. The check fails if a
+plan does a full table scan, a filesort or uses a temporary table on a
+table holding more than --min-rows rows.
+
+Run it against a local, seeded database (never production). --seed only
+writes to the database named by SCRATCH_DB, and running it again with the
+same ROWS adds nothing:
+    SCRATCH_DB=hr_scratch DB_NAME=hr_scratch python check_query_plans.py --seed 20000
+    python check_query_plans.py --min-rows 1000
+
+Exit code is 0 when every plan is clean and 1 otherwise.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+from datetime import date, datetime, timedelta
+
+import pymysql
+from db import get_db_config
+import query_log
+import repository
+
+# Queries that are expected to trip a check, with the reason. Keep this short.
+ALLOWED = {
+    # GROUP BY over the joined page of users: the temporary table holds at
+    # most one page of groups, whatever the size of leave_summary.
+    'employee_details_page: directory page': {'temporary'},
+    'employee_details_page: directory page (hr)': {'temporary'},
+}
+
+# Seeded leave requests get fixed ids from here up, so INSERT IGNORE makes re-seeding a no-op
+SEED_ID_BASE = 900_000_000
+
+_TABLE_ALIAS_RE = re.compile(r"\b(?:FROM|JOIN)\s+`?(\w+)`?(?:\s+(?:AS\s+)?(?!WHERE|JOIN|LEFT|INNER|ON|GROUP|ORDER|LIMIT)(\w+))?",
+                             re.IGNORECASE)
+
+
+def hot_queries(user_id, gmail):
+    """(label, callable) pairs mirroring what each page asks the repository for"""
+    first_page = repository.list_leave_requests('pending', limit=20)
+    cursor = (first_page[-1]['created_at'], first_page[-1]['id']) if first_page else (datetime.now(), 2**31)
+    return [
+        ('show_leave_requests: pending', lambda: repository.list_leave_requests('pending')),
+        ('show_leave_requests: approved', lambda: repository.list_leave_requests('approved')),
+        ('show_leave_requests: rejected', lambda: repository.list_leave_requests('rejected')),
+        ('show_leave_requests: next page', lambda: repository.list_leave_requests('pending', cursor=cursor, limit=20)),
+        ('show_leave_requests: approved this year',
+         lambda: repository.list_leave_requests('approved', limit=21, year=date.today().year)),
+        ('approve_leave_page: tab counts + page',
+         lambda: repository.load_leave_tab('approved', limit=21, year=date.today().year,
+                                           count_years={'approved': date.today().year,
+                                                        'rejected': date.today().year})),
+        ('show_leave_status', lambda: repository.list_user_leave_requests(user_id)),
+        ('show_leave_status: recent years',
+         lambda: repository.list_user_leave_requests(user_id, since=date(date.today().year - 1, 1, 1))),
+        ('employee_details_page: directory page', lambda: repository.list_employee_directory(limit=26)),
+        ('employee_details_page: directory page (hr)', lambda: repository.list_employee_directory(role='hr', limit=26)),
+        ('request_leave_page: overlap check',
+         lambda: repository.find_overlapping_requests(user_id, date.today(), date.today() + timedelta(days=4))),
+        ('overlap_report_page', lambda: list(repository.iter_active_requests())),
+        ('absence_calendar_page: window',
+         lambda: repository.load_approved_intervals(date.today(), date.today() + timedelta(days=83))),
+        ('absence_calendar_page: refresh',
+         lambda: repository.load_approved_intervals(date.today(), date.today() + timedelta(days=83),
+                                                    updated_since=datetime.now() - timedelta(minutes=5))),
+        ('show_leave_requests: staffing headcounts', repository.count_users_by_role),
+        ('show_leave_requests: holiday calendar', lambda: repository.list_holidays('default')),
+        ('login_user', lambda: repository.get_user(user_id)),
+        ('signup_user', lambda: repository.find_user(user_id, gmail)),
+    ]
+
+
+def table_rows(conn):
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT TABLE_NAME, TABLE_ROWS FROM INFORMATION_SCHEMA.TABLES
+            WHERE TABLE_SCHEMA = DATABASE()
+        """)
+        return {row['TABLE_NAME']: row['TABLE_ROWS'] or 0 for row in cur.fetchall()}
+
+
+def _aliases(sql):
+    aliases = {}
+    for table, alias in _TABLE_ALIAS_RE.findall(sql):
+        aliases[table] = table
+        if alias:
+            aliases[alias] = table
+    return aliases
+
+
+def _tables_in(node):
+    """Names of every table accessed somewhere below a plan node"""
+    names = []
+    if isinstance(node, dict):
+        if 'table_name' in node:
+            names.append(node['table_name'])
+        for value in node.values():
+            names.extend(_tables_in(value))
+    elif isinstance(node, list):
+        for item in node:
+            names.extend(_tables_in(item))
+    return names
+
+
+def plan_problems(plan, aliases, rows, min_rows):
+    """Return [(kind, table)] for every full scan / filesort / temporary table on a big table"""
+    problems = []
+
+    def big(alias):
+        return rows.get(aliases.get(alias, alias), 0) > min_rows
+
+    def walk(node):
+        if isinstance(node, dict):
+            if node.get('access_type') == 'ALL' and big(node.get('table_name')):
+                problems.append(('full_scan', node.get('table_name')))
+            for flag, kind in (('using_filesort', 'filesort'), ('using_temporary_table', 'temporary')):
+                if node.get(flag):
+                    for table in _tables_in(node):
+                        if big(table):
+                            problems.append((kind, table))
+                            break
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    walk(plan)
+    return problems
+
+
+def explain(conn, sql, args):
+    with conn.cursor() as cur:
+        cur.execute("EXPLAIN FORMAT=JSON " + sql, args)
+        row = cur.fetchone()
+        return json.loads(list(row.values())[0])
+
+
+def seed(conn, leave_rows):
+    """Insert deterministic synthetic users and leave requests so plans reflect real sizes.
+
+    Refuses (RuntimeError) unless the connected database is the one named by SCRATCH_DB.
+    """
+    rng = random.Random(42)
+    users = max(leave_rows // 20, 10)
+    with conn.cursor() as cur:
+        cur.execute("SELECT DATABASE() AS name")
+        database = cur.fetchone()['name']
+        if not database or database != os.getenv('SCRATCH_DB'):
+            raise RuntimeError(f"Refusing to seed {database!r}: set SCRATCH_DB={database} "
+                               f"if it is a throwaway database")
+        cur.executemany(
+            "INSERT IGNORE INTO users (id, gmail, password, role, name) VALUES (%s, %s, %s, %s, %s)",
+            [(f"plan{i:06d}", f"plan{i:06d}@example.com", 'x', 'hr' if i % 50 == 0 else 'employee',
+              f"Plan User {i:06d}") for i in range(users)]
+        )
+        base = date.today() - timedelta(days=5 * 365)
+        batch = []
+        for i in range(leave_rows):
+            uid = f"plan{rng.randrange(users):06d}"
+            start = base + timedelta(days=rng.randrange(6 * 365))
+            status = rng.choices(('pending', 'approved', 'rejected'), (1, 7, 2))[0]
+            batch.append((SEED_ID_BASE + i, uid, f"Plan User {uid[4:]}", start,
+                          start + timedelta(days=rng.randrange(10)), 'seeded', status))
+            if len(batch) == 5000:
+                cur.executemany("""
+                    INSERT IGNORE INTO leave_requests (id, user_id, name, start_date, end_date, reason, status)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                """, batch)
+                batch = []
+        if batch:
+            cur.executemany("""
+                INSERT IGNORE INTO leave_requests (id, user_id, name, start_date, end_date, reason, status)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, batch)
+        cur.execute("ANALYZE TABLE users, leave_requests")
+        cur.fetchall()
+    conn.commit()
+    print(f"🌱 Seeded {users} users and {leave_rows} leave requests")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--min-rows', type=int, default=1000,
+                        help="only flag tables with more rows than this (default: 1000)")
+    parser.add_argument('--seed', type=int, metavar='ROWS',
+                        help="first insert this many synthetic leave requests (test databases only)")
+    parser.add_argument('--user', help="user id to run per-user queries for (default: any user)")
+    args = parser.parse_args()
+
+    conn = pymysql.connect(**get_db_config())
+    try:
+        if args.seed:
+            try:
+                seed(conn, args.seed)
+            except RuntimeError as e:
+                print(f"❌ {e}")
+                return 1
+
+        with conn.cursor() as cur:
+            if args.user:
+                cur.execute("SELECT id, gmail FROM users WHERE id = %s", (args.user,))
+            else:
+                cur.execute("SELECT id, gmail FROM users ORDER BY id LIMIT 1")
+            user = cur.fetchone()
+        if not user:
+            print("❌ No users found; seed the database first (--seed)")
+            return 1
+
+        rows = table_rows(conn)
+        failures = 0
+        for label, call in hot_queries(user['id'], user['gmail']):
+            with query_log.capture() as statements:
+                call()
+            allowed = ALLOWED.get(label, set())
+            for sql, sql_args in statements:
+                plan = explain(conn, sql, sql_args)
+                problems = [(kind, table) for kind, table in plan_problems(plan, _aliases(sql), rows, args.min_rows)
+                            if kind not in allowed]
+                if problems:
+                    failures += 1
+                    print(f"❌ {label}")
+                    for kind, table in problems:
+                        print(f"   {kind} on {table}")
+                    print(f"   {query_log.fingerprint(sql)}")
+                else:
+                    note = f" (allowed: {', '.join(sorted(allowed))})" if allowed else ''
+                    print(f"✅ {label}{note}")
+
+        if failures:
+            print(f"\n❌ {failures} query plan(s) regressed")
+            return 1
+        print("\n✅ All query plans use indexes")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
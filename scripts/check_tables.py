@@ -2,19 +2,12 @@
 Script to check and create necessary database tables
 """
 import pymysql
-from dotenv import load_dotenv
-import os
+from db import get_db_config
 
 def get_db_connection():
     """Create a database connection"""
-    load_dotenv()
     try:
-        conn = pymysql.connect(
-            host=os.getenv('DB_HOST', 'localhost'),
-            user=os.getenv('DB_USER', 'root'),
-            password=os.getenv('DB_PASSWORD', ''),
-            database=os.getenv('DB_NAME', 'hrms')
-        )
+        conn = pymysql.connect(**get_db_config(cursorclass=pymysql.cursors.Cursor))
         print("✅ Successfully connected to database")
         return conn
     except Exception as e:
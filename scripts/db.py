@@ -1,20 +1,427 @@
 import pymysql
+from pymysql.constants import SERVER_STATUS
 from dotenv import load_dotenv
+import logging
 import os
+import random
+import threading
+import time
+from collections import Counter
+import query_log
+from query_log import InstrumentedCursor
 
 # Load environment variables from .env file
 load_dotenv()
 
-def connect_db():
+logger = logging.getLogger('hr.db')
+
+
+class PoolTimeoutError(pymysql.err.OperationalError):
+    """Raised when no pooled connection becomes free within the checkout timeout"""
+
+
+class PooledConnection:
+    """Thin wrapper around a pymysql connection that returns it to the pool on close()"""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._released = False
+
+    @property
+    def open(self):
+        return not self._released and self._raw.open
+
+    def cursor(self, cursor=None):
+        """Return an instrumented cursor (see query_log)"""
+        if self._released:
+            raise pymysql.err.InterfaceError(0, "Connection already returned to the pool")
+        return InstrumentedCursor(self._raw.cursor(cursor))
+
+    def commit(self):
+        self._raw.commit()
+        if self._pool.role == 'primary':
+            note_write()
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._pool.release(self._raw)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __getattr__(self, name):
+        if self._released:
+            raise pymysql.err.InterfaceError(0, "Connection already returned to the pool")
+        return getattr(self._raw, name)
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of pymysql connections shared by all Streamlit sessions.
+
+    - at most ``max_size`` connections exist at any time (idle + checked out)
+    - at most ``max_idle`` connections are kept around when returned
+    - connections older than ``recycle`` seconds are closed instead of reused
+    - connections idle longer than ``ping_interval`` seconds are pinged (and
+      reconnected if the server dropped them) before being handed out
+    - acquire() waits up to ``timeout`` seconds for a free slot
+    """
+
+    def __init__(self, max_size=10, max_idle=5, recycle=3600, timeout=10,
+                 ping_interval=30, role='primary', **connect_kwargs):
+        self.role = role
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.recycle = recycle
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self.connect_kwargs = connect_kwargs
+
+        self._cond = threading.Condition()
+        self._idle = []  # (connection, created_at, last_used_at)
+        self._created_at = {}  # id(connection) -> created_at of checked out connections
+        self._size = 0
+        self._counters = {
+            'created': 0,
+            'recycled': 0,
+            'discarded': 0,
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'ping_failures': 0,
+        }
+
+    def _open(self):
+        return pymysql.connect(**self.connect_kwargs)
+
+    def _discard(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """Check out a healthy connection, creating one if the pool has room"""
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                now = time.time()
+                while self._idle:
+                    raw, created_at, last_used = self._idle.pop()
+                    if now - created_at > self.recycle:
+                        self._discard(raw)
+                        self._size -= 1
+                        self._counters['recycled'] += 1
+                        continue
+                    self._created_at[id(raw)] = created_at
+                    self._counters['checkouts'] += 1
+                    break
+                else:
+                    raw = None
+
+                if raw is not None:
+                    break
+
+                if self._size < self.max_size:
+                    # Reserve the slot, then connect outside the lock
+                    self._size += 1
+                    created_at = None
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters['timeouts'] += 1
+                    raise PoolTimeoutError(
+                        2003, f"Timed out after {self.timeout}s waiting for a database connection"
+                    )
+                self._counters['waits'] += 1
+                self._cond.wait(remaining)
+
+        if raw is None:
+            try:
+                raw = self._open()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._created_at[id(raw)] = time.time()
+                self._counters['created'] += 1
+                self._counters['checkouts'] += 1
+        elif now - last_used > self.ping_interval:
+            try:
+                raw.ping(reconnect=True)
+            except Exception:
+                with self._cond:
+                    self._counters['ping_failures'] += 1
+                    self._created_at.pop(id(raw), None)
+                    self._size -= 1
+                    self._cond.notify()
+                self._discard(raw)
+                raise
+
+        return PooledConnection(self, raw)
+
+    def release(self, raw):
+        """Return a connection to the pool, dropping it if it is broken or surplus"""
+        keep = False
+        if raw.open:
+            try:
+                # Never hand out a connection still holding another caller's transaction
+                # (it would also pin an old REPEATABLE READ snapshot)
+                if raw.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+                    raw.rollback()
+                keep = True
+            except Exception:
+                keep = False
+
+        with self._cond:
+            created_at = self._created_at.pop(id(raw), time.time())
+            if keep and len(self._idle) < self.max_idle and time.time() - created_at <= self.recycle:
+                self._idle.append((raw, created_at, time.time()))
+            else:
+                self._counters['recycled' if keep and len(self._idle) < self.max_idle else 'discarded'] += 1
+                self._size -= 1
+                self._discard(raw)
+            self._cond.notify()
+
+    def close_all(self):
+        """Close every idle connection (checked out ones are closed when released)"""
+        with self._cond:
+            while self._idle:
+                raw, _, _ = self._idle.pop()
+                self._size -= 1
+                self._discard(raw)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                'role': self.role,
+                'size': self._size,
+                'idle': idle,
+                'in_use': self._size - idle,
+                'max_size': self.max_size,
+                **self._counters,
+            }
+
+
+DB_NAME = os.getenv('DB_NAME', 'hr_management')
+
+
+def get_db_config(database=True, **overrides):
+    """Connection settings shared by the app and every maintenance script.
+
+    Pass database=False to connect to the server without selecting a schema
+    (e.g. before CREATE DATABASE). Any keyword overrides the default.
+    """
+    config = {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'user': os.getenv('DB_USER', 'root'),
+        'password': os.getenv('DB_PASSWORD', ''),  # Enter your MySQL root password here
+        'port': int(os.getenv('DB_PORT', 3306)),
+        'charset': 'utf8mb4',
+        'cursorclass': pymysql.cursors.DictCursor
+    }
+    if os.getenv('DB_READ_TIMEOUT'):
+        # Client-side cap (seconds) on waiting for a reply; a hung server then
+        # fails with error 2013 instead of blocking the page
+        config['read_timeout'] = float(os.getenv('DB_READ_TIMEOUT'))
+    if database:
+        config['database'] = DB_NAME
+    config.update(overrides)
+    return config
+
+
+def get_replica_config(**overrides):
+    """Connection settings for the read replica, or None when DB_REPLICA_HOST is unset.
+
+    Credentials and schema default to the primary's.
+    """
+    host = os.getenv('DB_REPLICA_HOST')
+    if not host:
+        return None
+    config = get_db_config(**overrides)
+    config['host'] = host
+    config['port'] = int(os.getenv('DB_REPLICA_PORT', config['port']))
+    config['user'] = os.getenv('DB_REPLICA_USER', config['user'])
+    config['password'] = os.getenv('DB_REPLICA_PASSWORD', config['password'])
+    return config
+
+
+# Reads for a session go to the primary for this long after that session wrote,
+# so users always see their own changes despite replication lag
+REPLICA_STICKY_SECONDS = float(os.getenv('DB_REPLICA_STICKY_SECONDS', 5))
+
+_pools = {}
+_pool_lock = threading.Lock()
+_last_write = {}  # session key -> time.monotonic() of its last commit on the primary
+_local = threading.local()
+
+
+def set_session(key):
+    """Tag DB work on this thread (one Streamlit rerun) with a session key, e.g. the user id"""
+    _local.session = key
+
+
+def current_session():
+    return getattr(_local, 'session', None)
+
+
+def note_write(key=None):
+    """Remember that ``key`` (default: the current session) just wrote to the primary"""
+    key = key if key is not None else current_session()
+    if key is not None:
+        _last_write[key] = time.monotonic()
+
+
+def recently_wrote(key=None):
+    key = key if key is not None else current_session()
+    if key is None:
+        return False
+    last = _last_write.get(key)
+    if last is None:
+        return False
+    if time.monotonic() - last > REPLICA_STICKY_SECONDS:
+        _last_write.pop(key, None)
+        return False
+    return True
+
+
+def get_pool(role='primary'):
+    """Return the process-wide pool for 'primary' or 'replica', creating it on first use.
+
+    Without a configured replica, 'replica' is the primary pool.
+    """
+    if role == 'replica' and get_replica_config() is None:
+        role = 'primary'
+    pool = _pools.get(role)
+    if pool is None:
+        with _pool_lock:
+            pool = _pools.get(role)
+            if pool is None:
+                config = get_db_config() if role == 'primary' else get_replica_config()
+                pool = ConnectionPool(
+                    max_size=int(os.getenv('DB_POOL_SIZE', 10)),
+                    max_idle=int(os.getenv('DB_POOL_MAX_IDLE', 5)),
+                    recycle=int(os.getenv('DB_POOL_RECYCLE', 3600)),
+                    timeout=float(os.getenv('DB_POOL_TIMEOUT', 10)),
+                    ping_interval=float(os.getenv('DB_POOL_PING_INTERVAL', 30)),
+                    role=role,
+                    **config
+                )
+                _pools[role] = pool
+    return pool
+
+
+def pool_stats(role='primary'):
+    """Snapshot of a pool's counters (size, idle, in_use, waits, timeouts, ...)"""
+    return get_pool(role).stats()
+
+
+def connect_db(readonly=False):
+    """Check out a pooled connection; call close() on it to give it back.
+
+    readonly=True routes to the replica (if configured) unless the current
+    session committed a write within the last DB_REPLICA_STICKY_SECONDS.
+    """
+    role = 'replica' if readonly and not recently_wrote() else 'primary'
     try:
-        connection = pymysql.connect(
-            host=os.getenv('DB_HOST', 'localhost'),
-            user=os.getenv('DB_USER', 'root'),
-            password=os.getenv('DB_PASSWORD', ''),  # Enter your MySQL root password here
-            database=os.getenv('DB_NAME', 'hr_management'),
-            cursorclass=pymysql.cursors.DictCursor
-        )
-        return connection
+        return get_pool(role).acquire()
     except pymysql.Error as e:
         print(f"Error connecting to MySQL: {e}")
         raise
+
+
+# MySQL errors after which the whole transaction can simply be run again
+RETRYABLE_ERRORS = {
+    1213: 'deadlock',
+    1205: 'lock_wait_timeout',
+    2006: 'server_gone',
+    2013: 'lost_connection',
+}
+TX_MAX_ATTEMPTS = int(os.getenv('DB_TX_MAX_ATTEMPTS', 4))
+TX_BACKOFF_MS = float(os.getenv('DB_TX_BACKOFF_MS', 50))
+TX_BACKOFF_MAX_MS = float(os.getenv('DB_TX_BACKOFF_MAX_MS', 1000))
+# Total time a transaction may spend sleeping between attempts
+TX_RETRY_BUDGET_MS = float(os.getenv('DB_TX_RETRY_BUDGET_MS', 2000))
+
+_tx_counters = Counter()
+_tx_lock = threading.Lock()
+
+
+def _count(*keys):
+    with _tx_lock:
+        for key in keys:
+            _tx_counters[key] += 1
+
+
+def transaction_stats():
+    """Counters for run_transaction: committed, retries (total and per reason), gave_up, failed"""
+    with _tx_lock:
+        return dict(_tx_counters)
+
+
+def run_transaction(work, readonly=False, max_attempts=None):
+    """Run ``work(cursor)`` in one transaction on a pooled connection and commit it.
+
+    Deadlocks, lock wait timeouts and dropped connections roll back and run
+    ``work`` again on a fresh connection, after a jittered exponential
+    backoff, until max_attempts (DB_TX_MAX_ATTEMPTS) or the retry budget
+    (DB_TX_RETRY_BUDGET_MS) runs out. ``work`` must therefore be safe to
+    repeat: everything it does has to go through the cursor. A connection
+    lost during COMMIT is never retried, since the commit may have landed.
+    Returns whatever ``work`` returns.
+    """
+    max_attempts = max_attempts or TX_MAX_ATTEMPTS
+    slept_ms = 0.0
+    attempt = 0
+    while True:
+        attempt += 1
+        conn = connect_db(readonly=readonly)
+        committing = False
+        try:
+            with conn.cursor() as cur:
+                result = work(cur)
+            committing = True
+            conn.commit()
+            _count('committed', *(('recovered',) if attempt > 1 else ()))
+            return result
+        except pymysql.err.OperationalError as e:
+            code = e.args[0] if e.args else None
+            reason = RETRYABLE_ERRORS.get(code)
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            if reason is None or (committing and reason in ('server_gone', 'lost_connection')):
+                _count('failed')
+                raise
+            if reason in ('server_gone', 'lost_connection'):
+                # Idle connections to the same server are most likely dead too
+                conn._pool.close_all()
+
+            delay_ms = random.uniform(0, min(TX_BACKOFF_MAX_MS, TX_BACKOFF_MS * 2 ** (attempt - 1)))
+            if attempt >= max_attempts or slept_ms + delay_ms > TX_RETRY_BUDGET_MS:
+                _count('gave_up')
+                logger.error("transaction failed after %d attempt(s): %s (%s)", attempt, reason, e)
+                raise
+            _count('retries', f'retries_{reason}')
+            query_log.record_retry(reason)
+            logger.warning("transaction attempt %d hit %s, retrying in %.0f ms", attempt, reason, delay_ms)
+            slept_ms += delay_ms
+            time.sleep(delay_ms / 1000)
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            conn.close()
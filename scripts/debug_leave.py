@@ -2,26 +2,19 @@
 Debug script for leave request functionality
 """
 import pymysql
-from dotenv import load_dotenv
-import os
+from db import get_db_config
 import sys
 
 def connect_db():
     """Create a database connection"""
     try:
-        load_dotenv()
+        config = get_db_config()
         print("\n🔧 Database connection details:")
-        print(f"Host: {os.getenv('DB_HOST', 'localhost')}")
-        print(f"User: {os.getenv('DB_USER', 'root')}")
-        print(f"Database: {os.getenv('DB_NAME', 'hrms')}")
+        print(f"Host: {config['host']}")
+        print(f"User: {config['user']}")
+        print(f"Database: {config['database']}")
         
-        conn = pymysql.connect(
-            host=os.getenv('DB_HOST', 'localhost'),
-            user=os.getenv('DB_USER', 'root'),
-            password=os.getenv('DB_PASSWORD', ''),
-            database=os.getenv('DB_NAME', 'hrms'),
-            cursorclass=pymysql.cursors.DictCursor
-        )
+        conn = pymysql.connect(**config)
         print("✅ Successfully connected to database")
         return conn
     except Exception as e:
@@ -2,6 +2,7 @@ import pymysql
 from dotenv import load_dotenv
 import os
 import sys
+from db import get_db_config
 
 def debug_login():
     try:
@@ -18,14 +19,7 @@ def debug_login():
         print(f"DB_NAME: {os.getenv('DB_NAME')}")
         
         # Database configuration
-        db_config = {
-            'host': os.getenv('DB_HOST', 'localhost'),
-            'user': os.getenv('DB_USER', 'root'),
-            'password': os.getenv('DB_PASSWORD', 'mukulinblr#123'),
-            'database': os.getenv('DB_NAME', 'hr_management'),
-            'charset': 'utf8mb4',
-            'cursorclass': pymysql.cursors.DictCursor
-        }
+        db_config = get_db_config()
         
         print("\nAttempting to connect to database...")
         connection = pymysql.connect(**db_config)
@@ -1,21 +1,10 @@
 import pymysql
-from dotenv import load_dotenv
-import os
+from db import get_db_config
 
 def fix_database():
     try:
-        # Load environment variables
-        load_dotenv()
-        
         # Database configuration
-        db_config = {
-            'host': os.getenv('DB_HOST', 'localhost'),
-            'user': os.getenv('DB_USER', 'root'),
-            'password': os.getenv('DB_PASSWORD', 'mukulinblr#123'),
-            'database': os.getenv('DB_NAME', 'hr_management'),
-            'charset': 'utf8mb4',
-            'cursorclass': pymysql.cursors.DictCursor
-        }
+        db_config = get_db_config()
         
         print("Connecting to database...")
         connection = pymysql.connect(**db_config)
@@ -0,0 +1,256 @@
+"""
+Deterministic synthetic users and leave history for performance testing.
+
+The same --seed and --as-of date always produce the same data. Leave patterns follow what a
+real company looks like: most people take a handful of requests a year, a
+few take many; starts cluster in summer and around the holidays and avoid
+weekends; most requests are short; requests are filed days to weeks ahead
+and reviewed within a few days; older requests are decided (with HR
+comments on every rejection and some approvals) while upcoming ones are
+mostly pending; a small share are re-submissions overlapping an earlier
+request.
+
+Rows are bulk-loaded with LOAD DATA LOCAL INFILE (or batched INSERTs) in
+chunks, then leave_summary is rebuilt and the tables analyzed. Load into a
+local test database only:
+    python generate_synthetic_data.py --users 100000 --leaves 5000000
+    python generate_synthetic_data.py --users 2000 --leaves 50000 --seed 7 --method executemany
+
+Every generated user id starts with --prefix (default "gen"); all users
+get the password given by --password.
+"""
+import argparse
+import random
+import sys
+import time
+from bisect import bisect
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+
+import pymysql
+from bulk_import import load_data
+from db import get_db_config
+import partitions
+import repository
+
+USER_COLUMNS = ('id', 'gmail', 'password', 'role', 'name')
+LEAVE_COLUMNS = ('user_id', 'name', 'start_date', 'end_date', 'reason', 'status', 'hr_comment',
+                 'created_at', 'updated_at', 'leave_type')
+
+FIRST_NAMES = (
+    'Aarav', 'Aditi', 'Amit', 'Ananya', 'Arjun', 'Chen', 'Daniel', 'Divya', 'Elena', 'Fatima',
+    'Gabriel', 'Hana', 'Ishaan', 'Jia', 'Kavya', 'Liam', 'Maria', 'Mei', 'Mohammed', 'Nikhil',
+    'Noah', 'Olivia', 'Priya', 'Rahul', 'Rohan', 'Sara', 'Sofia', 'Tanvi', 'Vikram', 'Yuki',
+)
+LAST_NAMES = (
+    'Agarwal', 'Bose', 'Chatterjee', 'Das', 'Fernandes', 'Garcia', 'Gupta', 'Iyer', 'Johnson',
+    'Kapoor', 'Khan', 'Kim', 'Kumar', 'Li', 'Menon', 'Mehta', 'Nair', 'Patel', 'Reddy', 'Rossi',
+    'Sato', 'Sharma', 'Singh', 'Smith', 'Tanaka', 'Verma', 'Wang', 'Williams', 'Yadav', 'Zhang',
+)
+REASONS = (
+    'Family vacation', 'Medical appointment', 'Sick leave', 'Personal work', 'Wedding in the family',
+    'Festival at home', 'Moving house', 'Child care', 'Travel', 'Exam preparation', 'Rest and recovery',
+    'Attending a conference',
+)
+SICK_REASONS = {'Medical appointment', 'Sick leave', 'Rest and recovery'}
+APPROVE_COMMENTS = ('Enjoy your time off', 'Approved, please hand over pending tasks', 'Approved',
+                    'Get well soon')
+REJECT_COMMENTS = ('Team is short-staffed in this period', 'Please reschedule after the release',
+                   'Overlaps with a critical deadline', 'Insufficient leave balance',
+                   'Too many team members already away')
+
+# Relative weight of leave starting in each month (Jan..Dec)
+MONTH_WEIGHTS = (0.8, 0.7, 0.9, 1.0, 1.1, 1.3, 1.7, 1.6, 0.9, 1.0, 1.1, 1.8)
+# (probability, min days, max days)
+DURATIONS = ((0.45, 1, 1), (0.35, 2, 5), (0.15, 6, 10), (0.05, 11, 21))
+RESUBMIT_RATE = 0.03
+
+
+def generate_users(rng, count, hr_ratio, prefix, password):
+    """Yield user rows; roughly one HR user per 1 / hr_ratio employees"""
+    for n in range(count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        role = 'hr' if rng.random() < hr_ratio else 'employee'
+        user_id = f"{prefix}{n:07d}"
+        yield (user_id, f"{first.lower()}.{last.lower()}.{n}@example.com", password, role, f"{first} {last}")
+
+
+def _weighted_index(rng, cum_weights):
+    return bisect(cum_weights, rng.random() * cum_weights[-1])
+
+
+def _start_date(rng, year, month_cum):
+    month = _weighted_index(rng, month_cum) + 1
+    day = rng.randint(1, 28 if month == 2 else 30)
+    start = date(year, month, day)
+    # Leave rarely starts on a weekend; move it to the Monday
+    if start.weekday() >= 5:
+        start += timedelta(days=7 - start.weekday())
+    return start
+
+
+def _duration(rng):
+    roll = rng.random()
+    for probability, low, high in DURATIONS:
+        if roll < probability:
+            return rng.randint(low, high)
+        roll -= probability
+    return 1
+
+
+def _work_time(rng, day):
+    return datetime.combine(day, datetime.min.time()) + timedelta(
+        hours=rng.randint(8, 18), minutes=rng.randint(0, 59), seconds=rng.randint(0, 59))
+
+
+def generate_leaves(rng, users, count, years, now):
+    """Yield leave request rows for ``users`` [(id, name)] over the last ``years`` years (and a few months ahead)"""
+    # Heavy-tailed activity: a few people file far more requests than others
+    user_cum = list(accumulate(rng.lognormvariate(0, 0.8) for _ in users))
+    month_cum = list(accumulate(MONTH_WEIGHTS))
+    first_year = now.year - years + 1
+    today = now.date()
+    last_request = {}
+
+    for _ in range(count):
+        user_index = _weighted_index(rng, user_cum)
+        user_id, name = users[user_index]
+
+        previous = last_request.get(user_index)
+        if previous and rng.random() < RESUBMIT_RATE:
+            # Re-submission overlapping an earlier request (usually after a rejection)
+            start = previous[0] + timedelta(days=rng.randint(-1, 1))
+            end = max(start, previous[1] + timedelta(days=rng.randint(-1, 2)))
+        else:
+            year = rng.randint(first_year, now.year + (1 if rng.random() < 0.05 else 0))
+            start = _start_date(rng, year, month_cum)
+            end = start + timedelta(days=_duration(rng) - 1)
+        last_request[user_index] = (start, end)
+
+        # Filed 1 day to ~2 months ahead, during working hours
+        lead = min(90, max(1, int(rng.lognormvariate(2.3, 0.8))))
+        created_at = _work_time(rng, start - timedelta(days=lead))
+        if created_at > now:
+            created_at = now - timedelta(minutes=rng.randint(1, 600))
+
+        # Reviewed hours to a few days after filing; upcoming leave is often still waiting
+        review_delay = timedelta(hours=rng.lognormvariate(2.5, 1.0))
+        reviewed = created_at + review_delay < now
+        if not reviewed or (start > today and rng.random() < 0.6) or rng.random() < 0.005:
+            status, comment, updated_at = 'pending', None, created_at
+        else:
+            status = 'rejected' if rng.random() < 0.15 else 'approved'
+            if status == 'rejected':
+                comment = rng.choice(REJECT_COMMENTS)
+            else:
+                comment = rng.choice(APPROVE_COMMENTS) if rng.random() < 0.3 else None
+            updated_at = min(now, created_at + review_delay)
+
+        reason = rng.choice(REASONS)
+        if reason in SICK_REASONS:
+            leave_type = 'sick'
+        else:
+            leave_type = 'casual' if end == start and rng.random() < 0.5 else 'annual'
+        yield (user_id, name, start, end, reason, status, comment, created_at, updated_at, leave_type)
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _insert(cursor, method, table, columns, rows):
+    if method == 'load-data':
+        load_data(cursor, table, columns, rows)
+    else:
+        cursor.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})", rows
+        )
+
+
+def generate(users=1000, leaves=20000, years=5, seed=42, hr_ratio=0.02, prefix='gen', password='password',
+             chunk_size=20000, method='load-data', as_of=None, progress=print):
+    """Generate and load the data set as seen on ``as_of`` (default today); returns {'users', 'leaves', 'seconds'}"""
+    rng = random.Random(seed)
+    now = datetime.combine(as_of or date.today(), datetime.min.time()) + timedelta(hours=12)
+    started = time.perf_counter()
+
+    conn = pymysql.connect(**get_db_config(local_infile=(method == 'load-data')))
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM users WHERE id LIKE %s LIMIT 1", (prefix + '%',))
+            if cursor.fetchone():
+                raise RuntimeError(f"users with prefix {prefix!r} already exist; use a fresh database or --prefix")
+            if partitions.list_partitions(cursor):
+                added = partitions.ensure_past_partitions(cursor, now.year - years + 1)
+                added += partitions.ensure_future_partitions(cursor, today=now.date())
+                if added:
+                    progress(f"… added partitions {', '.join(added)}")
+            cursor.execute("SET SESSION unique_checks = 0")
+
+            user_rows = []
+            for chunk in _chunks(generate_users(rng, users, hr_ratio, prefix, password), chunk_size):
+                _insert(cursor, method, 'users', USER_COLUMNS, chunk)
+                conn.commit()
+                user_rows.extend((row[0], row[4]) for row in chunk)
+            progress(f"… {len(user_rows):,} users loaded")
+
+            loaded = 0
+            for chunk in _chunks(generate_leaves(rng, user_rows, leaves, years, now), chunk_size):
+                _insert(cursor, method, 'leave_requests', LEAVE_COLUMNS, chunk)
+                conn.commit()
+                loaded += len(chunk)
+                elapsed = time.perf_counter() - started
+                progress(f"… {loaded:,} leave requests loaded ({loaded / max(elapsed, 1e-9):,.0f} rows/s)")
+
+            cursor.execute("SET SESSION unique_checks = 1")
+            progress("… rebuilding leave_summary")
+            repository.rebuild_leave_summary(cursor)
+            conn.commit()
+            cursor.execute("ANALYZE TABLE users, leave_requests, leave_summary")
+            cursor.fetchall()
+    finally:
+        conn.close()
+
+    return {'users': users, 'leaves': leaves, 'seconds': round(time.perf_counter() - started, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000, help="number of users (default: 1000)")
+    parser.add_argument('--leaves', type=int, default=20000, help="number of leave requests (default: 20000)")
+    parser.add_argument('--years', type=int, default=5, help="years of history, ending this year (default: 5)")
+    parser.add_argument('--seed', type=int, default=42, help="random seed (default: 42)")
+    parser.add_argument('--hr-ratio', type=float, default=0.02, help="share of users with the HR role")
+    parser.add_argument('--prefix', default='gen', help="user id prefix (default: gen)")
+    parser.add_argument('--password', default='password', help="password for every generated user")
+    parser.add_argument('--chunk-size', type=int, default=20000, help="rows per load/commit (default: 20000)")
+    parser.add_argument('--method', choices=('load-data', 'executemany'), default='load-data')
+    parser.add_argument('--as-of', type=lambda v: datetime.strptime(v, '%Y-%m-%d').date(),
+                        help="YYYY-MM-DD treated as today (default: today)")
+    args = parser.parse_args()
+
+    if args.users < 1 or args.leaves < 0 or args.years < 1:
+        parser.error("--users and --years must be at least 1 and --leaves not negative")
+
+    print(f"🧪 Generating {args.users:,} users and {args.leaves:,} leave requests (seed {args.seed})...")
+    try:
+        stats = generate(args.users, args.leaves, args.years, args.seed, args.hr_ratio, args.prefix,
+                         args.password, args.chunk_size, args.method, args.as_of)
+    except Exception as e:
+        print(f"❌ Generation failed: {e}")
+        return 1
+    rate = (stats['users'] + stats['leaves']) / stats['seconds'] if stats['seconds'] else 0
+    print(f"✅ Loaded {stats['users']:,} users and {stats['leaves']:,} leave requests "
+          f"in {stats['seconds']}s ({rate:,.0f} rows/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
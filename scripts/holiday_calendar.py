@@ -0,0 +1,138 @@
+"""
+Holiday calendars and working-day counts.
+
+Public holidays are stored per region in the `holidays` table; users.region
+picks the calendar (NULL means HOLIDAY_DEFAULT_REGION). For each region a
+WorkingCalendar holds the prefix sums of working days (not a weekend day,
+not a holiday) from 1970-01-01 to 2099-12-31, indexed by days since
+1970-01-01. The working days of any range are then one subtraction, O(1),
+and a whole array of ranges is one vectorized lookup. Calendars are cached
+per region for HOLIDAY_CACHE_TTL seconds.
+
+leave_summary.approved_days counts working days, so `load` rebuilds it
+after changing holidays, and `region` recounts the user it moves. Leave
+writes read the holidays inside their transaction (load_calendar), never
+from the cache, so a load in another process is seen right away.
+
+Usage:
+    python holiday_calendar.py load holidays.csv        # CSV columns: region,date,name
+    python holiday_calendar.py list [REGION] [YEAR]
+    python holiday_calendar.py region USER_ID [REGION]  # no REGION: back to the default
+"""
+import csv
+import os
+import sys
+import threading
+import time
+from datetime import date, datetime
+
+import numpy as np
+import repository
+
+DEFAULT_REGION = os.getenv('HOLIDAY_DEFAULT_REGION', 'default')
+# Weekday numbers (Monday = 0) that are never working days
+WEEKEND_DAYS = tuple(int(day) for day in os.getenv('WEEKEND_DAYS', '5,6').split(',') if day.strip())
+HOLIDAY_CACHE_TTL = int(os.getenv('HOLIDAY_CACHE_TTL', 3600))
+CALENDAR_END = date(2099, 12, 31)
+
+_calendars = {}  # region -> (WorkingCalendar, loaded_at)
+_calendars_lock = threading.Lock()
+
+
+class WorkingCalendar:
+    """Working-day prefix sums for one region; days are counted from 1970-01-01"""
+
+    def __init__(self, region, holidays):
+        """``holidays`` is {date: name}"""
+        n_days = repository.epoch_day(CALENDAR_END) + 1
+        days = np.arange(n_days)
+        working = ~np.isin((days + 3) % 7, WEEKEND_DAYS)  # 1970-01-01 was a Thursday
+        holiday_days = np.array([repository.epoch_day(day) for day in holidays], dtype=np.int64)
+        working[holiday_days[(holiday_days >= 0) & (holiday_days < n_days)]] = False
+        self.region = region
+        self.holidays = dict(holidays)
+        self.n_days = n_days
+        # prefix[d] = working days before day d
+        self.prefix = np.concatenate(([0], np.cumsum(working)))
+
+    def count(self, start_days, end_days):
+        """Working days in each inclusive [start, end] (epoch-day arrays); 0 where end < start"""
+        starts = np.clip(start_days, 0, self.n_days)
+        ends = np.clip(np.asarray(end_days) + 1, 0, self.n_days)
+        return np.maximum(self.prefix[ends] - self.prefix[starts], 0)
+
+    def working_days(self, start, end):
+        """Working days from ``start`` to ``end`` inclusive (dates)"""
+        first = min(max(repository.epoch_day(start), 0), self.n_days)
+        last = min(max(repository.epoch_day(end) + 1, 0), self.n_days)
+        return max(int(self.prefix[last] - self.prefix[first]), 0)
+
+
+def load_calendar(region=None, cur=None):
+    """Read ``region``'s holidays now (through ``cur`` if given) and refresh the cache with them"""
+    region = region or DEFAULT_REGION
+    calendar = WorkingCalendar(region, repository.list_holidays(region, cur=cur))
+    with _calendars_lock:
+        _calendars[region] = (calendar, time.monotonic())
+    return calendar
+
+
+def calendar_for(region=None):
+    """The (cached) WorkingCalendar of ``region`` (default region if None), for display"""
+    with _calendars_lock:
+        cached = _calendars.get(region or DEFAULT_REGION)
+    if cached and time.monotonic() - cached[1] < HOLIDAY_CACHE_TTL:
+        return cached[0]
+    return load_calendar(region)
+
+
+def working_days(start, end, region=None):
+    """Working days from ``start`` to ``end`` inclusive in ``region``"""
+    return calendar_for(region).working_days(start, end)
+
+
+def load_csv(path):
+    """Upsert holidays from a region,date,name CSV; returns the number of rows"""
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = [(row['region'].strip(), datetime.strptime(row['date'].strip(), '%Y-%m-%d').date(),
+                 row['name'].strip()) for row in csv.DictReader(f)]
+    repository.upsert_holidays(rows)
+    with _calendars_lock:
+        _calendars.clear()
+    return len(rows)
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else 'list'
+    try:
+        if command == 'load' and len(sys.argv) == 3:
+            count = load_csv(sys.argv[2])
+            print(f"✅ Loaded {count} holidays")
+            rows = repository.rebuild_leave_summary()
+            print(f"✅ Rebuilt leave_summary ({rows} rows)")
+        elif command == 'region' and len(sys.argv) in (3, 4):
+            user_id, region = sys.argv[2], sys.argv[3] if len(sys.argv) == 4 else None
+            if not repository.set_user_region(user_id, region):
+                print(f"❌ No user {user_id}")
+                return 1
+            print(f"✅ {user_id} now uses the {region or DEFAULT_REGION} calendar; leave_summary recounted")
+        elif command == 'list':
+            region = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_REGION
+            year = int(sys.argv[3]) if len(sys.argv) > 3 else date.today().year
+            calendar = calendar_for(region)
+            for day, name in sorted(calendar.holidays.items()):
+                if day.year == year:
+                    print(f"{day}  {day.strftime('%a')}  {name}")
+            print(f"📅 {calendar.working_days(date(year, 1, 1), date(year, 12, 31))} working days "
+                  f"in {year} ({region})")
+        else:
+            print(__doc__)
+            return 2
+    except Exception as e:
+        print(f"❌ Holiday calendar command failed: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,24 +1,8 @@
 import streamlit as st
-import pymysql
-from dotenv import load_dotenv
-import os
 from datetime import datetime, date
-
-# Database connection function
-def get_db_connection():
-    """Create and return a database connection"""
-    try:
-        load_dotenv()
-        return pymysql.connect(
-            host=os.getenv('DB_HOST', 'localhost'),
-            user=os.getenv('DB_USER', 'root'),
-            password=os.getenv('DB_PASSWORD', ''),
-            database=os.getenv('DB_NAME', 'hrms'),
-            cursorclass=pymysql.cursors.DictCursor
-        )
-    except Exception as e:
-        st.error(f"❌ Database error: {e}")
-        return None
+import balances
+import holiday_calendar
+import repository
 
 def request_leave_page():
     """Simplified leave request page"""
@@ -50,6 +34,7 @@ def request_leave_page():
         with col2:
             end_date = st.date_input("To Date", min_value=start_date)
             
+        leave_type = st.selectbox("Leave Type", repository.LEAVE_TYPES, format_func=str.title)
         reason = st.text_area("Reason", placeholder="Enter reason for leave")
         submit = st.form_submit_button("Submit Request")
     
@@ -58,33 +43,26 @@ def request_leave_page():
         if not reason.strip():
             st.error("Please enter a reason for leave")
             return
+        if (end_date - start_date).days + 1 > repository.MAX_LEAVE_DAYS:
+            st.error(f"A single request can cover at most {repository.MAX_LEAVE_DAYS} days; split longer leave.")
+            return
+        if not holiday_calendar.working_days(start_date, end_date, st.session_state.get('user_region')):
+            st.error("These dates are all weekends or public holidays; there is no working day to take off.")
+            return
             
-        conn = None
         try:
-            conn = get_db_connection()
-            if not conn:
-                st.error("❌ Could not connect to database")
-                return
-                
-            with conn.cursor() as cursor:
-                # Insert new leave request
-                sql = """
-                INSERT INTO leave_requests 
-                (user_id, name, start_date, end_date, reason, status)
-                VALUES (%s, %s, %s, %s, %s, 'pending')
-                """
-                cursor.execute(sql, (user_id, name, start_date, end_date, reason))
-                conn.commit()
-                
-                # Set success flag and reload
-                st.session_state.leave_submitted = True
-                st.rerun()
-                
+            # Insert new leave request
+            repository.create_leave_request(user_id, name, start_date, end_date, reason, leave_type)
+        except repository.LeaveOverlapError as e:
+            st.error("⚠️ These dates overlap leave you have already requested:")
+            for req in e.overlaps:
+                st.write(f"- {req['start_date']} to {req['end_date']} ({req['status']})")
         except Exception as e:
             st.error(f"Error submitting leave request: {e}")
-        finally:
-            if conn and hasattr(conn, 'open') and conn.open:
-                conn.close()
+        else:
+            # Set success flag and reload
+            st.session_state.leave_submitted = True
+            st.rerun()
     
     # Show leave status
     show_leave_status(user_id)
@@ -93,38 +71,26 @@ def show_leave_status(user_id):
     """Display leave status for the user"""
     st.subheader("📋 My Leave Status")
     
+    # Recent years only (leave_requests is partitioned by start year);
+    # "Show older requests" widens the window a year at a time
+    since_key = f"leave_status_since_{user_id}"
+    if since_key not in st.session_state:
+        st.session_state[since_key] = date(date.today().year - 1, 1, 1)
+    since = st.session_state[since_key]
+    
     # Fetch leave requests
     leaves = []
-    conn = None
     try:
-        conn = get_db_connection()
-        if not conn:
-            st.error("❌ Could not connect to database")
-            return
-            
-        with conn.cursor() as cursor:
-            # Get leave requests for this user
-            cursor.execute("""
-                SELECT id, start_date, end_date, reason, status, 
-                       COALESCE(hr_comment, '') as hr_comment,
-                       created_at
-                FROM leave_requests 
-                WHERE user_id = %s 
-                ORDER BY created_at DESC
-            """, (user_id,))
-            
-            leaves = cursor.fetchall()
-            
+        # Get leave requests for this user
+        leaves = repository.list_user_leave_requests(user_id, since=since)
     except Exception as e:
         st.error(f"Error fetching leave requests: {e}")
         return
-    finally:
-        if conn and hasattr(conn, 'open') and conn.open:
-            conn.close()
     
     # Display leave requests
     if not leaves:
-        st.info("No leave requests found. Submit a request above.")
+        st.info(f"No leave requests since {since.year}. Submit a request above.")
+        _older_requests_button(since_key, since)
         return
     
     # Show each leave request
@@ -143,11 +109,14 @@ def show_leave_status(user_id):
         end_date = leave.get('end_date')
         
         # Create a simple display
-        with st.expander(f"{status_emoji} Leave #{leave.get('id')} - {status.title()}"):
+        archived = " (archived)" if leave.get('archived') else ""
+        with st.expander(f"{status_emoji} Leave #{leave.get('id')} - {status.title()}{archived}"):
             col1, col2 = st.columns(2)
             
             with col1:
                 st.write(f"**Request ID:** #{leave.get('id')}")
+                if leave.get('leave_type'):
+                    st.write(f"**Type:** {leave['leave_type'].title()}")
                 if start_date and end_date:
                     st.write(f"**From:** {start_date}")
                     st.write(f"**To:** {end_date}")
@@ -160,7 +129,10 @@ def show_leave_status(user_id):
                         if isinstance(end_date, str):
                             end_date = datetime.strptime(str(end_date), '%Y-%m-%d').date()
                         duration = (end_date - start_date).days + 1
-                        st.write(f"**Duration:** {duration} day{'s' if duration > 1 else ''}")
+                        working = holiday_calendar.working_days(start_date, end_date,
+                                                                st.session_state.get('user_region'))
+                        st.write(f"**Duration:** {working} working day{'s' if working != 1 else ''} "
+                                 f"({duration} calendar day{'s' if duration > 1 else ''})")
                 except Exception as e:
                     print(f"Error calculating duration: {e}")
             
@@ -174,6 +146,14 @@ def show_leave_status(user_id):
             st.write("**Reason:**")
             st.write(leave.get('reason', 'No reason provided'))
 
+    _older_requests_button(since_key, since)
+
+def _older_requests_button(since_key, since):
+    st.caption(f"Showing requests starting from {since.year}")
+    if st.button("Show older requests", key=f"older_{since_key}"):
+        st.session_state[since_key] = date(since.year - 1, 1, 1)
+        st.rerun()
+
 def leave_status_page():
     """Main leave status page that shows the status of all leave requests"""
     if "user_id" not in st.session_state:
@@ -187,26 +167,15 @@ def leave_history_page():
     st.subheader("📜 Leave History (Approved Only)")
     
     try:
-        con = connect_db()
-        cur = con.cursor()
-
-        query = """
-            SELECT start_date, end_date, reason, status
-            FROM leave_requests
-            WHERE user_id = %s AND status = 'approved'
-            ORDER BY start_date DESC
-        """
-        cur.execute(query, (st.session_state.user_id,))
-        leaves = cur.fetchall()
+        leaves = repository.list_user_leave_requests(st.session_state.user_id, status='approved')
 
         if leaves:
             for leave in leaves:
-                # Convert the row to a dictionary for easier access
                 leave_dict = {
-                    'start_date': leave[0],
-                    'end_date': leave[1],
-                    'reason': leave[2],
-                    'status': leave[3].capitalize() if leave[3] else 'Pending'
+                    'start_date': leave['start_date'],
+                    'end_date': leave['end_date'],
+                    'reason': leave['reason'],
+                    'status': leave['status'].capitalize() if leave['status'] else 'Pending'
                 }
                 
                 st.markdown(
@@ -224,10 +193,6 @@ def leave_history_page():
     except Exception as e:
         st.error(f"Something went wrong: {e}")
 
-    finally:
-        if cur: cur.close()
-        if con: con.close()
-
 def resign_page():
     st.subheader("Resign Request")
     if st.button("Submit Resignation"):
@@ -255,14 +220,38 @@ def employee_leave_page():
         st.subheader("Welcome to your Leave Dashboard")
         st.write("Use the menu to manage your leave requests.")
         
-        # Quick stats
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Total Leave Requests", "5")
-        with col2:
-            st.metric("Approved", "3")
-        with col3:
-            st.metric("Pending", "2")
+        # Quick stats for this year, from the precomputed leave_summary row
+        try:
+            summary = repository.get_leave_summary(st.session_state.user_id)
+        except Exception as e:
+            st.error(f"Error loading leave summary: {e}")
+        else:
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Total Leave Requests", summary['total'])
+            with col2:
+                st.metric("Approved", summary['approved'])
+            with col3:
+                st.metric("Pending", summary['pending'])
+            with col4:
+                st.metric("Days Taken", summary['approved_days'])
+            st.caption(f"Figures for {date.today().year}")
+
+        # Days left per leave type (accrued + carried forward - used)
+        try:
+            balance = balances.user_balance(st.session_state.user_id)
+        except Exception as e:
+            st.error(f"Error loading leave balance: {e}")
+        else:
+            st.markdown("**Leave Balance**")
+            for col, (leave_type, days) in zip(st.columns(len(balance)), balance.items()):
+                days = {k: round(v, 1) for k, v in days.items()}
+                with col:
+                    st.metric(
+                        f"{leave_type.title()} leave", f"{days['available']:g} days",
+                        help=(f"{days['accrued']:g} accrued + {days['carried']:g} carried forward "
+                              f"- {days['used']:g} used - {days['pending']:g} pending")
+                    )
         
         # Show recent leave requests
         show_leave_status(st.session_state.user_id)
@@ -280,4 +269,3 @@ def employee_leave_page():
         st.session_state.user_id = None
         st.session_state.user_role = None
         st.rerun()
-    app.run()
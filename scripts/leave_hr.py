@@ -1,9 +1,26 @@
 # leave_hr.py
 import streamlit as st
-import pymysql
-from db import connect_db
+import logging
+import os
+from datetime import date, timedelta
+import absence
+import holiday_calendar
+import overlaps
+import repository
+import staffing
 from streamlit_option_menu import option_menu
 
+logger = logging.getLogger('hr.leave_hr')
+
+STATUS_TABS = {
+    'pending': ("⏳ Pending", "No pending leave requests! 🎉"),
+    'approved': ("✅ Approved", "No approved leave requests yet."),
+    'rejected': ("❌ Rejected", "No rejected leave requests."),
+}
+
+PAGE_SIZE_OPTIONS = [10, 20, 50, 100]
+DEFAULT_PAGE_SIZE = int(os.getenv('LEAVE_PAGE_SIZE', 20))
+
 def approve_leave_page():
     st.title("📋 Leave Requests Dashboard")
     st.markdown("---")
@@ -13,62 +30,144 @@ def approve_leave_page():
         st.warning("⛔ You don't have permission to access this page.")
         return
 
-    # Add tabs for different statuses
-    tab1, tab2, tab3 = st.tabs(["⏳ Pending", "✅ Approved", "❌ Rejected"])
-    
-    with tab1:
-        show_leave_requests('pending', "No pending leave requests! 🎉")
-    
-    with tab2:
-        show_leave_requests('approved', "No approved leave requests yet.")
-    
-    with tab3:
-        show_leave_requests('rejected', "No rejected leave requests.")
+    # Only the selected status is loaded; its page and the per-status counts
+    # for the tab labels come back from one connection
+    status = st.session_state.get('leave_tab', 'pending')
+    state = _page_state(status)
+    # Each tab's count uses that tab's start-year filter, so it matches its list
+    count_years = {s: _page_state(s)['year'] for s in STATUS_TABS}
+    try:
+        counts, requests = repository.load_leave_tab(
+            status, cursor=state['cursors'][-1], limit=state['size'] + 1, year=state['year'],
+            count_years=count_years
+        )
+    except Exception as e:
+        st.error(f"❌ Error loading {status} leave requests: {str(e)}")
+        return
 
-def show_leave_requests(status, empty_message):
-    """Helper function to display leave requests by status"""
-    conn = None
-    cursor = None
-    
+    col1, col2 = st.columns([4, 1])
+    with col1:
+        st.radio(
+            "Status", list(STATUS_TABS), key='leave_tab', horizontal=True,
+            format_func=lambda s: f"{STATUS_TABS[s][0]} ({counts.get(s, 0)}"
+                                  + (f" in {count_years[s]})" if count_years[s] else ")"),
+            label_visibility="collapsed"
+        )
+    with col2:
+        # Decided requests default to this year: the query then reads one partition
+        this_year = date.today().year
+        years = [None] + list(range(this_year + 1, this_year - 6, -1))
+        year = st.selectbox(
+            "Start year", years, index=years.index(state['year']) if state['year'] in years else 0,
+            key=f"leave_year_{status}", format_func=lambda y: "All years" if y is None else str(y),
+            label_visibility="collapsed"
+        )
+        if year != state['year']:
+            state['year'] = year
+            state['cursors'] = [None]
+            st.rerun()
+    show_leave_requests(status, STATUS_TABS[status][1], requests)
+
+def _page_state(status):
+    """Keyset paging state for one status tab: page size, start-year filter and a stack of page-start cursors"""
+    key = f"leave_pages_{status}"
+    if key not in st.session_state:
+        st.session_state[key] = {
+            'size': DEFAULT_PAGE_SIZE,
+            'cursors': [None],
+            # Pending requests can start in any year; decided ones default to this year
+            'year': None if status == 'pending' else date.today().year,
+        }
+    return st.session_state[key]
+
+def _page_controls(status, state, has_next):
+    """Previous/next buttons and page-size picker for a status tab"""
+    col1, col2, col3, col4 = st.columns([1, 1, 2, 2])
+    with col1:
+        if st.button("⬅️ Previous", key=f"prev_{status}", disabled=len(state['cursors']) == 1):
+            state['cursors'].pop()
+            st.rerun()
+    with col2:
+        if st.button("Next ➡️", key=f"next_{status}", disabled=not has_next):
+            state['cursors'].append(state['next'])
+            st.rerun()
+    with col3:
+        st.caption(f"Page {len(state['cursors'])}")
+    with col4:
+        size = st.selectbox(
+            "Per page", PAGE_SIZE_OPTIONS,
+            index=PAGE_SIZE_OPTIONS.index(state['size']) if state['size'] in PAGE_SIZE_OPTIONS else 1,
+            key=f"page_size_{status}", label_visibility="collapsed"
+        )
+        if size != state['size']:
+            state['size'] = size
+            state['cursors'] = [None]
+            st.rerun()
+
+def show_leave_requests(status, empty_message, requests=None):
+    """Helper function to display one page of leave requests by status.
+
+    ``requests`` may be passed in when the caller already fetched the page
+    (page size + 1 rows from the current cursor).
+    """
+    state = _page_state(status)
     try:
-        conn = connect_db()
-        cursor = conn.cursor(pymysql.cursors.DictCursor)
-        
-        # Get leave requests with the specified status
-        cursor.execute("""
-            SELECT lr.id, lr.user_id, lr.name, lr.start_date, lr.end_date, 
-                   lr.reason, lr.status, lr.created_at,
-                   COALESCE(lr.hr_comment, '') as hr_comment
-            FROM leave_requests lr
-            WHERE lr.status = %s
-            ORDER BY lr.created_at DESC
-        """, (status,))
-        
-        requests = cursor.fetchall()
+        if requests is None:
+            # Fetch one row more than the page to know whether a next page exists
+            requests = repository.list_leave_requests(status, cursor=state['cursors'][-1], limit=state['size'] + 1)
+        has_next = len(requests) > state['size']
+        requests = requests[:state['size']]
+        if has_next:
+            state['next'] = (requests[-1]['created_at'], requests[-1]['id'])
         
+        # Outcome of the action that triggered this rerun
+        action_result = st.session_state.pop('leave_action_result', None)
+        if action_result:
+            level, message = action_result
+            getattr(st, level)(message)
+
         if not requests:
+            if len(state['cursors']) > 1:
+                # The page we were on emptied out (e.g. last requests approved); start over
+                state['cursors'] = [None]
+                st.rerun()
             st.info(empty_message)
             return
         
+        risks = {}
+        if status == 'pending':
+            bulk_action_form(requests)
+            try:
+                # Days each request would take its role over the staffing limit
+                risks = staffing.coverage_risks(requests)
+            except Exception as e:
+                logger.warning("Coverage check failed: %s", e)
+                st.caption("⚠️ Staffing check unavailable right now.")
+
         # Display each request
         for req in requests:
             with st.container():
-                # Calculate days requested
-                days = (req['end_date'] - req['start_date']).days + 1
+                # Working days requested (weekends and the requester's public holidays excluded)
+                calendar_days = (req['end_date'] - req['start_date']).days + 1
+                days = holiday_calendar.working_days(req['start_date'], req['end_date'], req['region'])
+                short = f"{days} working day{'s' if days != 1 else ''}"
+                duration = f"{short} ({calendar_days} calendar day{'s' if calendar_days > 1 else ''})"
                 
                 # Create expandable section for each request
-                with st.expander(f"📅 {req['name']} - {days} day{'s' if days > 1 else ''} ({req['start_date']} to {req['end_date']})"):
+                flag = "⚠️ " if req['id'] in risks else ""
+                with st.expander(f"{flag}📅 {req['name']} - {short} ({req['start_date']} to {req['end_date']})"):
                     col1, col2 = st.columns(2)
                     
                     with col1:
                         st.markdown(f"**Employee ID:** {req['user_id']}")
                         st.markdown(f"**Requested On:** {req['created_at'].strftime('%Y-%m-%d %H:%M')}")
                         st.markdown(f"**Status:** {req['status'].capitalize()}")
+                        st.markdown(f"**Type:** {req['leave_type'].title()}")
                     
                     with col2:
                         st.markdown(f"**From:** {req['start_date']}")
                         st.markdown(f"**To:** {req['end_date']}")
-                        st.markdown(f"**Duration:** {days} day{'s' if days > 1 else ''}")
+                        st.markdown(f"**Duration:** {duration}")
                     
                     st.markdown("**Reason:**")
                     st.info(req['reason'])
@@ -81,6 +180,13 @@ def show_leave_requests(status, empty_message):
                     # Action buttons for pending requests
                     if status == 'pending':
                         st.markdown("### Take Action")
+
+                        if req['id'] in risks:
+                            risky_days = risks[req['id']]
+                            shown = ", ".join(f"{day} ({away} away, limit {limit})" for day, away, limit in risky_days[:5])
+                            more = f" and {len(risky_days) - 5} more" if len(risky_days) > 5 else ""
+                            st.warning(f"⚠️ Approving leaves too few {req['role']} staff on "
+                                       f"{len(risky_days)} day{'s' if len(risky_days) > 1 else ''}: {shown}{more}")
                         
                         # Use a form to handle the comment and action together
                         with st.form(key=f"action_form_{req['id']}"):
@@ -90,124 +196,140 @@ def show_leave_requests(status, empty_message):
                             
                             col1, col2, _ = st.columns([1, 1, 2])
                             with col1:
-                                if st.form_submit_button("✅ Approve", use_container_width=True):
-                                    update_leave_status(req['id'], 'approved', comment)
+                                approve_label = "✅ Approve anyway" if req['id'] in risks else "✅ Approve"
+                                if st.form_submit_button(approve_label, use_container_width=True):
+                                    update_leave_status(req['id'], 'approved', comment, req['version'])
                                     st.rerun()
                             with col2:
                                 if st.form_submit_button("❌ Reject", use_container_width=True):
-                                    update_leave_status(req['id'], 'rejected', comment)
+                                    update_leave_status(req['id'], 'rejected', comment, req['version'])
                                     st.rerun()
                     
                     st.markdown("---")  # Divider between requests
+
+        _page_controls(status, state, has_next)
     
     except Exception as e:
         st.error(f"❌ Error loading {status} leave requests: {str(e)}")
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-
-def update_leave_status(request_id, status, comment=None):
-    """Update the status of a leave request and add optional HR comment"""
-    conn = None
-    cursor = None
-    
-    try:
-        conn = connect_db()
-        cursor = conn.cursor()
-        
-        # Update the leave request status and add HR comment if provided
-        if comment and comment.strip():
-            cursor.execute(
-                """
-                UPDATE leave_requests 
-                SET status = %s, 
-                    hr_comment = %s,
-                    updated_at = NOW()
-                WHERE id = %s
-                """,
-                (status, comment.strip(), request_id)
-            )
-        else:
-            cursor.execute(
-                """
-                UPDATE leave_requests 
-                SET status = %s,
-                    updated_at = NOW()
-                WHERE id = %s
-                """,
-                (status, request_id)
+
+def bulk_action_form(requests):
+    """Approve or reject several pending requests from the current page at once"""
+    with st.expander("🗂️ Bulk action"):
+        with st.form(key="bulk_action_form"):
+            selected = st.multiselect(
+                "Requests", [req['id'] for req in requests],
+                format_func=lambda request_id: next(
+                    f"#{req['id']} {req['name']} ({req['start_date']} to {req['end_date']})"
+                    for req in requests if req['id'] == request_id
+                )
             )
-            
-        conn.commit()
-        st.success(f"✅ Leave request {status} successfully!")
-        
-        # Get request details for notification
-        cursor.execute(
-            "SELECT user_id, name, start_date, end_date FROM leave_requests WHERE id = %s",
-            (request_id,)
-        )
-        req = cursor.fetchone()
-        
-        if req:
+            select_all = st.checkbox(f"All {len(requests)} requests on this page")
+            comment = st.text_area("Comment for all selected (optional)")
+            col1, col2, _ = st.columns([1, 1, 2])
+            with col1:
+                approve = st.form_submit_button("✅ Approve selected", use_container_width=True)
+            with col2:
+                reject = st.form_submit_button("❌ Reject selected", use_container_width=True)
+
+    if approve or reject:
+        ids = [req['id'] for req in requests] if select_all else selected
+        if not ids:
+            st.warning("Select at least one request.")
+            return
+        status = 'approved' if approve else 'rejected'
+        try:
+            outcomes = repository.bulk_set_leave_status(ids, status, comment)
+        except Exception as e:
+            logger.exception("Bulk update of %d leave requests to %s failed", len(ids), status)
+            st.error(f"❌ Error updating leave requests: {str(e)}")
+            return
+
+        updated = sum(1 for outcome in outcomes.values() if outcome == 'updated')
+        busy = [str(request_id) for request_id, outcome in outcomes.items() if outcome == 'conflict']
+        done = [str(request_id) for request_id, outcome in outcomes.items() if outcome == 'not_pending']
+        gone = [str(request_id) for request_id, outcome in outcomes.items() if outcome == 'not_found']
+        logger.info("Bulk %s %d of %d leave requests", status, updated, len(outcomes))
+        if status == 'approved' and updated:
+            # The staffing check re-reads approvals on its next use
+            absence.mark_stale()
+        message = f"✅ {updated} leave request{'s' if updated != 1 else ''} {status}."
+        if done:
+            message += f" Already decided by another reviewer: #{', #'.join(done)}."
+        if gone:
+            message += f" No longer exist{'s' if len(gone) == 1 else ''}: #{', #'.join(gone)}."
+        if busy:
+            message += f" Being reviewed by someone else right now, try again: #{', #'.join(busy)}."
+        st.session_state.leave_action_result = ('warning' if busy or done or gone else 'success', message)
+        st.rerun()
+
+def update_leave_status(request_id, status, comment=None, expected_version=None):
+    """Approve or reject a pending request, unless another reviewer got there first.
+
+    The result is kept in session_state so it survives the rerun that follows.
+    """
+    try:
+        # Compare-and-set: only applies if the request is still pending at the version shown
+        result = repository.set_leave_status(request_id, status, comment, expected_version)
+        req = result['request']
+        if result['outcome'] == 'updated':
+            logger.info("Leave request %s set to %s", request_id, status)
+            if status == 'approved':
+                # Keep the staffing check's occupancy arrays current without a query
+                absence.record_approval(req)
+            st.session_state.leave_action_result = ('success', f"✅ Leave request {status} successfully!")
             # In a real app, you might want to send an email notification here
-            st.toast(f"Notification: {req[1]}'s leave request has been {status}")
+            st.toast(f"Notification: {req['name']}'s leave request has been {status}")
+        elif result['outcome'] == 'conflict':
+            logger.info("Leave request %s: lost review race (now %s)", request_id, req['status'])
+            if req['status'] == 'pending':
+                message = f"⚠️ Leave request #{request_id} was changed by another reviewer; please review it again."
+            else:
+                message = f"⚠️ Leave request #{request_id} was already {req['status']} by another reviewer."
+            st.session_state.leave_action_result = ('warning', message)
+        else:
+            st.session_state.leave_action_result = ('warning', f"⚠️ Leave request #{request_id} no longer exists.")
     
     except Exception as e:
-        error_msg = f"❌ Error updating leave status: {str(e)}"
-        st.error(error_msg)
-        import traceback
-        st.error(f"Technical details: {traceback.format_exc()}")
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+        logger.exception("Error updating leave request %s to %s", request_id, status)
+        st.error(f"❌ Error updating leave status: {str(e)}")
 
 
+DIRECTORY_PAGE_SIZE = int(os.getenv('DIRECTORY_PAGE_SIZE', 25))
+
 def employee_details_page():
     st.subheader("Employee Details")
-    con = None
-    cur = None
+
+    # Filters; changing them starts again from the first page
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        search = st.text_input("Search by name or ID", key="directory_search").strip()
+    with col2:
+        role = st.selectbox("Role", ["All", "employee", "hr"], key="directory_role",
+                            format_func=lambda r: r if r == "All" else r.upper() if r == "hr" else r.title())
+    filters = (search, role)
+    state = st.session_state.setdefault('directory_pages', {'filters': filters, 'cursors': [None]})
+    if state['filters'] != filters:
+        state['filters'] = filters
+        state['cursors'] = [None]
+
     try:
-        # Connect to database
-        con = connect_db()
-        if not con:
-            st.error("Failed to connect to database")
-            return
-            
-        cur = con.cursor()
-        
-        # Get all employees from users table
-        cur.execute("""
-            SELECT id, name, gmail, role 
-            FROM users 
-            WHERE role = 'employee' OR role = 'hr'
-            ORDER BY name
-        """)
-
-        employees = cur.fetchall()
+        # One query: a page of users plus their approved/pending counts and approved days
+        employees = repository.list_employee_directory(
+            search=search or None,
+            role=None if role == "All" else role,
+            cursor=state['cursors'][-1],
+            limit=DIRECTORY_PAGE_SIZE + 1
+        )
+        has_next = len(employees) > DIRECTORY_PAGE_SIZE
+        employees = employees[:DIRECTORY_PAGE_SIZE]
         
         if not employees:
-            st.info("No employees found in the database.")
+            st.info("No employees found in the database." if not (search or role != "All")
+                    else "No employees match these filters.")
             return
 
         for emp in employees:
-            user_id = emp['id']
-            
-            # Count approved leaves for this user
-            leave_count = 0
-            try:
-                cur.execute("""
-                    SELECT COUNT(*) as count 
-                    FROM leave_requests 
-                    WHERE user_id = %s AND status = 'approved'
-                """, (user_id,))
-                result = cur.fetchone()
-                leave_count = result['count'] if result else 0
-            except Exception as e:
-                st.warning(f"Could not fetch leave count for user {user_id}: {e}")
+            leave_count = emp['approved_count']
 
             # Display employee card
             st.markdown(
@@ -229,6 +351,9 @@ def employee_details_page():
                         <div style='background-color: #333; padding: 5px 10px; border-radius: 15px; display: inline-block;'>
                             <b>📝 Leaves:</b> {leave_count}
                         </div>
+                        <p style='margin: 8px 0 0 0; font-size: 0.9em; color: #bbb;'>
+                            ⏳ {emp['pending_count']} pending · 📅 {emp['approved_days']} days taken
+                        </p>
                     </div>
                 </div>
                 </div>
@@ -236,22 +361,116 @@ def employee_details_page():
                 unsafe_allow_html=True
             )
 
+        col1, col2, col3 = st.columns([1, 1, 4])
+        with col1:
+            if st.button("⬅️ Previous", key="directory_prev", disabled=len(state['cursors']) == 1):
+                state['cursors'].pop()
+                st.rerun()
+        with col2:
+            if st.button("Next ➡️", key="directory_next", disabled=not has_next):
+                state['cursors'].append((employees[-1]['name'], employees[-1]['id']))
+                st.rerun()
+        with col3:
+            st.caption(f"Page {len(state['cursors'])}")
+
     except Exception as e:
         st.error(f"Database error: {str(e)}")
         import traceback
         st.text(traceback.format_exc())
-        
-    finally:
-        if cur:
-            try:
-                cur.close()
-            except:
-                pass
-        if con:
-            try:
-                con.close()
-            except:
-                pass
+
+
+OVERLAP_REPORT_LIMIT = int(os.getenv('OVERLAP_REPORT_LIMIT', 200))
+
+def overlap_report_page():
+    """Pending/approved requests of the same employee whose dates overlap, company-wide"""
+    st.subheader("🔀 Overlapping Leave Requests")
+    st.caption("Pending and approved requests of one employee that cover the same days.")
+
+    # The report streams every active request, so it only runs on demand
+    if st.button("🔍 Run report", key="overlap_report_run"):
+        try:
+            pairs = list(overlaps.overlapping_requests(repository.iter_active_requests()))
+        except Exception as e:
+            logger.exception("Overlap report failed")
+            st.error(f"❌ Error building the overlap report: {str(e)}")
+            return
+        st.session_state.overlap_report = pairs
+
+    pairs = st.session_state.get('overlap_report')
+    if pairs is None:
+        return
+    if not pairs:
+        st.success("No overlapping leave requests. 🎉")
+        return
+
+    st.warning(f"⚠️ {len(pairs)} overlapping pair{'s' if len(pairs) != 1 else ''} found.")
+    for earlier, later in pairs[:OVERLAP_REPORT_LIMIT]:
+        st.markdown(
+            f"**{earlier['name']}** ({earlier['user_id']}): "
+            f"#{earlier['id']} {earlier['start_date']} to {earlier['end_date']} ({earlier['status']}) "
+            f"overlaps #{later['id']} {later['start_date']} to {later['end_date']} ({later['status']})"
+        )
+    if len(pairs) > OVERLAP_REPORT_LIMIT:
+        st.caption(f"Showing the first {OVERLAP_REPORT_LIMIT}.")
+
+
+ABSENCE_MAX_DAYS = 366
+
+def absence_calendar_page():
+    """Heatmap of how many people are on approved leave each day of a window"""
+    st.subheader("📆 Absence Calendar")
+
+    today = date.today()
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        date_from = st.date_input("From", value=today - timedelta(days=today.weekday()), key="absence_from")
+    with col2:
+        date_to = st.date_input("To", value=date_from + timedelta(weeks=12, days=-1), key="absence_to")
+    with col3:
+        by_role = st.checkbox("By role", key="absence_by_role")
+    if date_to < date_from:
+        st.warning("The end date must not be before the start date.")
+        return
+    if (date_to - date_from).days >= ABSENCE_MAX_DAYS:
+        st.warning(f"Pick a window of at most {ABSENCE_MAX_DAYS} days.")
+        return
+
+    try:
+        # Cached per window; only approvals since the last load are read again
+        counts = absence.absence_counts(date_from, date_to)
+    except Exception as e:
+        logger.exception("Absence calendar failed for %s..%s", date_from, date_to)
+        st.error(f"❌ Error loading the absence calendar: {str(e)}")
+        return
+
+    if by_role:
+        groups = {("HR" if role == 'hr' else role.title()): per_day for role, per_day in counts.items()}
+    else:
+        groups = {"Everyone": sum(counts.values())}
+    for label, per_day in groups.items():
+        peak = int(per_day.max())
+        peak_day = date_from + timedelta(days=int(per_day.argmax()))
+        st.markdown(f"**{label}** · peak {peak} away" + (f" on {peak_day}" if peak else ""))
+        st.markdown(_heatmap_html(date_from, per_day, peak), unsafe_allow_html=True)
+
+def _heatmap_html(date_from, per_day, peak):
+    """Calendar grid (weekday rows, week columns) shaded by the number of people away"""
+    first_monday = date_from - timedelta(days=date_from.weekday())
+    weeks = (date_from + timedelta(days=len(per_day) - 1) - first_monday).days // 7 + 1
+    cells = [[""] * weeks for _ in range(7)]
+    for offset, away in enumerate(per_day):
+        day = date_from + timedelta(days=offset)
+        alpha = 0.1 + 0.9 * away / peak if peak and away else 0.05
+        cells[day.weekday()][(day - first_monday).days // 7] = (
+            f"<td title='{day}: {away} away' style='width: 14px; height: 14px; "
+            f"background-color: rgba(51, 99, 176, {alpha:.2f}); border-radius: 2px;'></td>"
+        )
+    rows = "".join(
+        f"<tr><td style='font-size: 0.7em; color: #888; padding-right: 4px;'>{name}</td>"
+        + "".join(cell or "<td></td>" for cell in cells[weekday]) + "</tr>"
+        for weekday, name in enumerate(("Mon", "", "Wed", "", "Fri", "", "Sun"))
+    )
+    return f"<table style='border-collapse: separate; border-spacing: 2px;'>{rows}</table>"
 
 
 def hr_leave_page():
@@ -272,10 +491,12 @@ def hr_leave_page():
                     options=[
                         'Approve/Reject Leave', 
                         'Employee Details', 
+                        'Overlap Report',
+                        'Absence Calendar',
                         'Email', 
                         'Logout'
                     ],
-                    icons=['check2-square', 'people', 'envelope', 'box-arrow-left'],
+                    icons=['check2-square', 'people', 'intersect', 'calendar3', 'envelope', 'box-arrow-left'],
                     menu_icon='briefcase',
                     default_index=0,
                     styles={
@@ -290,6 +511,10 @@ def hr_leave_page():
                 approve_leave_page()
             elif app == "Employee Details":
                 employee_details_page()
+            elif app == "Overlap Report":
+                overlap_report_page()
+            elif app == "Absence Calendar":
+                absence_calendar_page()
             elif app == "Email":
                 from gmail_reader import read_emails, display_emails
                 from email_classifier import classify_emails_with_gemini
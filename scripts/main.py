@@ -1,24 +1,35 @@
 # main.py
 import streamlit as st
 import pymysql
-from db import connect_db
+import logging
+import os
+import db
+import repository
+import query_log
 from leave_employee import employee_leave_page
 import time
 from otp_utils import generate_otp, send_otp_email, verify_otp, is_email_verified, clear_otp
 
+logging.basicConfig(
+    level=os.getenv('LOG_LEVEL', 'INFO'),
+    filename=os.getenv('LOG_FILE') or None,
+    format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+)
+logger = logging.getLogger('hr.main')
+
+# Per-rerun query accounting (see query_log) and read-your-writes replica routing (see db)
+query_log.start_rerun(st.session_state.get('user_id') or 'anonymous')
+db.set_session(st.session_state.get('user_id') or None)
+# Filled in at the end of the run if any read fell back to a cached result
+stale_banner = st.empty()
+
 #signup
 def signup_user(id, gmail, password, role, name):
     print(f"🔍 Starting signup process for: {gmail}")
-    con = None
-    cur = None
     try:
-        con = connect_db()
-        cur = con.cursor()
-        
         # Check if user already exists
         print("🔍 Checking for existing user...")
-        cur.execute("SELECT id FROM users WHERE id = %s OR gmail = %s", (id, gmail))
-        existing_user = cur.fetchone()
+        existing_user = repository.find_user(id, gmail)
         
         if existing_user:
             error_msg = f"User with ID '{id}' or email '{gmail}' already exists"
@@ -61,288 +72,226 @@ def signup_user(id, gmail, password, role, name):
         print(f"❌ {error_msg}")
         st.error("An unexpected error occurred. Please try again.")
         return False
-    finally:
-        if cur:
-            try:
-                cur.close()
-            except:
-                pass
-        if con:
-            try:
-                con.close()
-            except:
-                pass
-# Login function with enhanced debugging
+# Login function
 def login_user(user_id, password):
-    print("\n" + "="*50)
-    print(f"🔑 Login attempt for user: {user_id}")
-    print("="*50)
+    logger.info("Login attempt for user %s", user_id)
     
     try:
-        # Print environment variables for debugging
-        import os
-        from dotenv import load_dotenv
-        load_dotenv()
-        
-        print("\nEnvironment variables:")
-        print(f"DB_HOST: {os.getenv('DB_HOST')}")
-        print(f"DB_USER: {os.getenv('DB_USER')}")
-        print(f"DB_NAME: {os.getenv('DB_NAME')}")
-        
-        # Get database connection
-        print("\nConnecting to database...")
-        con = connect_db()
-        if not con:
-            print("❌ Failed to connect to database")
-            return None
-            
-        cursor = con.cursor()
-        
         # First check if user exists and get their data
-        query = "SELECT id, role, name, password FROM users WHERE id = %s"
-        print(f"\nExecuting query: {query} with id={user_id}")
-        
-        cursor.execute(query, (user_id,))
-        user_data = cursor.fetchone()
+        user_data = repository.get_user(user_id)
         
         if not user_data:
-            print(f"❌ No user found with ID: {user_id}")
-            
-            # Debug: List all users in the database
-            print("\nDebug: Listing all users in the database:")
-            cursor.execute("SELECT id, name, role FROM users")
-            all_users = cursor.fetchall()
-            if all_users:
-                for user in all_users:
-                    print(f"- {user['id']}: {user['name']} ({user['role']})")
-            else:
-                print("No users found in the database!")
-                
+            logger.info("Login failed: no user with ID %s", user_id)
             return None
         
-        # Print user data (except password for security)
-        print(f"\n✅ User found in database:")
-        print(f"ID: {user_data['id']}")
-        print(f"Name: {user_data['name']}")
-        print(f"Role: {user_data['role']}")
-        print(f"Stored password: {'*' * len(str(user_data['password']))}")
-        print(f"Provided password: {'*' * len(password)}")
-        
         # Verify password (in production, use hashed password comparison)
         if user_data['password'] == password:
-            print("\n✅ Password matches! Login successful!")
-            return (str(user_data['id']), str(user_data['role']), str(user_data['name']))
+            logger.info("Login successful for %s (%s)", user_data['id'], user_data['role'])
+            return (str(user_data['id']), str(user_data['role']), str(user_data['name']), user_data.get('region'))
         else:
-            print("\n❌ Password does not match!")
-            print(f"Stored password length: {len(str(user_data['password']))}")
-            print(f"Provided password length: {len(password)}")
+            logger.info("Login failed: wrong password for %s", user_id)
             return None
             
-    except Exception as e:
-        print(f"\n❌ Error during login: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Error during login for %s", user_id)
         return None
-        
-    finally:
-        try:
-            if 'con' in locals() and con:
-                con.close()
-                print("Database connection closed.")
-        except Exception as e:
-            print(f"Error closing connection: {e}")
-        
-        print("\n" + "="*50 + "\n")
 
-if "logged_in" not in st.session_state or not st.session_state.logged_in:
-    if 'show_login' not in st.session_state:
-        st.session_state.show_login = False
+# try/finally: st.rerun() and st.stop() raise, and their runs (usually the
+# ones that write) must still be accounted for
+try:
+    if "logged_in" not in st.session_state or not st.session_state.logged_in:
+        if 'show_login' not in st.session_state:
+            st.session_state.show_login = False
 
-    if st.session_state.show_login:
-        #Login Form
-        st.title("🧠 :blue[Smart] HR Management System")
-        st.header("Login to Your Account")
+        if st.session_state.show_login:
+            #Login Form
+            st.title("🧠 :blue[Smart] HR Management System")
+            st.header("Login to Your Account")
 
-        with st.form("login_form"):
-            id = st.text_input("Enter ID", key="login_id")
-            password = st.text_input("Password", type="password", key="login_pass")
-            submit_login = st.form_submit_button("Submit")
+            with st.form("login_form"):
+                id = st.text_input("Enter ID", key="login_id")
+                password = st.text_input("Password", type="password", key="login_pass")
+                submit_login = st.form_submit_button("Submit")
 
-            if submit_login:
-                if id and password:
-                    user_data = login_user(id, password)
-                    print(f"Login attempt - User data: {user_data}")
-                    
-                    if user_data and len(user_data) >= 3:  # Ensure we have all required fields
-                        try:
-                            # Clear any existing session state
-                            st.session_state.clear()
-                            
-                            # Set up new session
-                            st.session_state.logged_in = True
-                            st.session_state.user_id = str(user_data[0])
-                            st.session_state.user_role = str(user_data[1]).lower()  # Ensure lowercase
-                            st.session_state.user_name = str(user_data[2])
-                            
-                            print(f"Login successful - Session: {st.session_state}")
-                            st.rerun()
-                            
-                        except Exception as e:
-                            st.error(f"Error setting up session: {e}")
-                            print(f"Session setup error: {e}")
-                            st.session_state.clear()  # Clear any partial session data
-                            
+                if submit_login:
+                    if id and password:
+                        user_data = login_user(id, password)
+                        print(f"Login attempt - User data: {user_data}")
+
+                        if user_data and len(user_data) >= 3:  # Ensure we have all required fields
+                            try:
+                                # Clear any existing session state
+                                st.session_state.clear()
+
+                                # Set up new session
+                                st.session_state.logged_in = True
+                                st.session_state.user_id = str(user_data[0])
+                                st.session_state.user_role = str(user_data[1]).lower()  # Ensure lowercase
+                                st.session_state.user_name = str(user_data[2])
+                                st.session_state.user_region = user_data[3]  # holiday calendar (None: default)
+
+                                print(f"Login successful - Session: {st.session_state}")
+                                st.rerun()
+
+                            except Exception as e:
+                                st.error(f"Error setting up session: {e}")
+                                print(f"Session setup error: {e}")
+                                st.session_state.clear()  # Clear any partial session data
+
+                        else:
+                            error_msg = "Invalid ID or Password. Please try again."
+                            if user_data is None:
+                                error_msg = "No user found with these credentials."
+                            elif len(user_data) < 3:
+                                error_msg = "Invalid user data format. Please contact support."
+                            st.error(error_msg)
+                            print(f"Login failed: {error_msg}")
+                            st.session_state.clear()  # Ensure clean state on failed login
                     else:
-                        error_msg = "Invalid ID or Password. Please try again."
-                        if user_data is None:
-                            error_msg = "No user found with these credentials."
-                        elif len(user_data) < 3:
-                            error_msg = "Invalid user data format. Please contact support."
-                        st.error(error_msg)
-                        print(f"Login failed: {error_msg}")
-                        st.session_state.clear()  # Ensure clean state on failed login
-                else:
-                    st.warning("Please enter both ID and password.")
-        if st.button("Back to SignUp"):
-            st.session_state.show_login = False
+                        st.warning("Please enter both ID and password.")
+            if st.button("Back to SignUp"):
+                st.session_state.show_login = False
 
-    else:
-        # SignUp Form
-        st.title("🧠 :blue[Smart] HR Management System")
-        st.header("Create New Account!")
+        else:
+            # SignUp Form
+            st.title("🧠 :blue[Smart] HR Management System")
+            st.header("Create New Account!")
 
-        if 'signup_data' in st.session_state and st.session_state.signup_data.get('otp_sent', False):
-            # OTP Verification Step
-            st.info("Please check your email for the OTP")
-            otp = st.text_input("Enter OTP")
-            
-            if st.button("Verify OTP"):
-                print(f"Verifying OTP for {st.session_state.signup_data['gmail']}")
-            print(f"Stored OTP data: {otp_storage.get(st.session_state.signup_data['gmail'], 'No OTP found')}")
-            print(f"User entered OTP: {otp}")
-            
-            if not otp:
-                st.error("Please enter the OTP")
-            else:
-                if verify_otp(st.session_state.signup_data['gmail'], otp):
-                    print("OTP verified successfully")
-                    # OTP verified, complete registration
-                    try:
-                        con = connect_db()
-                        cur = con.cursor()
-                        print("Attempting to insert user into database...")
-                        cur.execute(
-                            "INSERT INTO users (id, gmail, password, role, name) VALUES (%s, %s, %s, %s, %s)",
-                            (
+            if 'signup_data' in st.session_state and st.session_state.signup_data.get('otp_sent', False):
+                # OTP Verification Step
+                st.info("Please check your email for the OTP")
+                otp = st.text_input("Enter OTP")
+
+                if st.button("Verify OTP"):
+                    print(f"Verifying OTP for {st.session_state.signup_data['gmail']}")
+                print(f"Stored OTP data: {otp_storage.get(st.session_state.signup_data['gmail'], 'No OTP found')}")
+                print(f"User entered OTP: {otp}")
+
+                if not otp:
+                    st.error("Please enter the OTP")
+                else:
+                    if verify_otp(st.session_state.signup_data['gmail'], otp):
+                        print("OTP verified successfully")
+                        # OTP verified, complete registration
+                        try:
+                            print("Attempting to insert user into database...")
+                            repository.create_user(
                                 st.session_state.signup_data['id'],
                                 st.session_state.signup_data['gmail'],
                                 st.session_state.signup_data['password'],
                                 st.session_state.signup_data['role'],
                                 st.session_state.signup_data['name']
                             )
-                        )
-                        con.commit()
-                        print("User created successfully in database")
-                        st.success("Account created successfully! Please login.")
-                        # Clear the signup data and OTP
-                        clear_otp(st.session_state.signup_data['gmail'])
-                        del st.session_state.signup_data
-                        st.rerun()
-                    except pymysql.IntegrityError as ie:
-                        error_msg = f"This account could not be created: {str(ie)}"
-                        print(f"IntegrityError: {error_msg}")
-                        st.error("This account could not be created. The user ID or email might already be in use.")
-                    except pymysql.Error as dbe:
-                        error_msg = f"Database error: {str(dbe)}"
-                        print(f"Database error: {error_msg}")
-                        st.error("A database error occurred. Please try again.")
-                    except Exception as e:
-                        error_msg = f"Unexpected error: {str(e)}"
-                        print(f"Unexpected error: {error_msg}")
-                        st.error("An unexpected error occurred. Please try again.")
-                    finally:
-                        if 'cur' in locals() and cur:
-                            cur.close()
-                        if 'con' in locals() and con:
-                            con.close()
-                else:
-                    print("OTP verification failed")
-                    if 'otp_attempts' not in st.session_state.signup_data:
-                        st.session_state.signup_data['otp_attempts'] = 0
-                    
-                    st.session_state.signup_data['otp_attempts'] += 1
-                    print(f"Failed attempt {st.session_state.signup_data['otp_attempts']}")
-                    
-                    if st.session_state.signup_data['otp_attempts'] >= 3:
-                        st.error("Too many failed attempts. Please try signing up again.")
-                        clear_otp(st.session_state.signup_data['gmail'])
-                        del st.session_state.signup_data
-                        st.rerun()
+                            print("User created successfully in database")
+                            st.success("Account created successfully! Please login.")
+                            # Clear the signup data and OTP
+                            clear_otp(st.session_state.signup_data['gmail'])
+                            del st.session_state.signup_data
+                            st.rerun()
+                        except pymysql.IntegrityError as ie:
+                            error_msg = f"This account could not be created: {str(ie)}"
+                            print(f"IntegrityError: {error_msg}")
+                            st.error("This account could not be created. The user ID or email might already be in use.")
+                        except pymysql.Error as dbe:
+                            error_msg = f"Database error: {str(dbe)}"
+                            print(f"Database error: {error_msg}")
+                            st.error("A database error occurred. Please try again.")
+                        except Exception as e:
+                            error_msg = f"Unexpected error: {str(e)}"
+                            print(f"Unexpected error: {error_msg}")
+                            st.error("An unexpected error occurred. Please try again.")
                     else:
-                        st.error(f"Invalid OTP. {3 - st.session_state.signup_data['otp_attempts']} attempts remaining.")
-            
-            if st.button("Resend OTP"):
-                otp = generate_otp(st.session_state.signup_data['gmail'])
-                if send_otp_email(st.session_state.signup_data['gmail'], otp):
-                    st.success("New OTP sent!")
-                else:
-                    st.error("Failed to resend OTP. Please try again.")
-                    
-            if st.button("Back to Signup"):
-                clear_otp(st.session_state.signup_data['gmail'])
-                del st.session_state.signup_data
-                st.rerun()
-                
-        else:
-            # Initial Signup Form
-            with st.form("signup_form"):
-                id = st.text_input("Enter your ID", key="signup_id")
-                gmail = st.text_input("Enter Email", key="signup_gmail")
-                password = st.text_input("Password", type="password", key="signup_pass")
-                confirm_password = st.text_input("Confirm Password", type="password", key="confirm_pass")
-                role = st.selectbox("Select Role", ["employee", "hr"], key="signup_role")
-                name = st.text_input("Full Name")
-                submit_signup = st.form_submit_button("Sign Up")
+                        print("OTP verification failed")
+                        if 'otp_attempts' not in st.session_state.signup_data:
+                            st.session_state.signup_data['otp_attempts'] = 0
 
-                if submit_signup:
-                    if id and gmail and password and name and confirm_password:
-                        if password != confirm_password:
-                            st.error("Passwords do not match!")
+                        st.session_state.signup_data['otp_attempts'] += 1
+                        print(f"Failed attempt {st.session_state.signup_data['otp_attempts']}")
+
+                        if st.session_state.signup_data['otp_attempts'] >= 3:
+                            st.error("Too many failed attempts. Please try signing up again.")
+                            clear_otp(st.session_state.signup_data['gmail'])
+                            del st.session_state.signup_data
+                            st.rerun()
                         else:
-                            signup_user(id, gmail, password, role, name)
+                            st.error(f"Invalid OTP. {3 - st.session_state.signup_data['otp_attempts']} attempts remaining.")
+
+                if st.button("Resend OTP"):
+                    otp = generate_otp(st.session_state.signup_data['gmail'])
+                    if send_otp_email(st.session_state.signup_data['gmail'], otp):
+                        st.success("New OTP sent!")
                     else:
-                        st.warning("Please fill all details...")
+                        st.error("Failed to resend OTP. Please try again.")
 
-        col1, col2 = st.columns([1, 3])
-        with col1:
-            st.markdown(":blue[Already have an account?]")
+                if st.button("Back to Signup"):
+                    clear_otp(st.session_state.signup_data['gmail'])
+                    del st.session_state.signup_data
+                    st.rerun()
 
-        with col2:
-            if st.button("Login"):
-                st.session_state.show_login = True
+            else:
+                # Initial Signup Form
+                with st.form("signup_form"):
+                    id = st.text_input("Enter your ID", key="signup_id")
+                    gmail = st.text_input("Enter Email", key="signup_gmail")
+                    password = st.text_input("Password", type="password", key="signup_pass")
+                    confirm_password = st.text_input("Confirm Password", type="password", key="confirm_pass")
+                    role = st.selectbox("Select Role", ["employee", "hr"], key="signup_role")
+                    name = st.text_input("Full Name")
+                    submit_signup = st.form_submit_button("Sign Up")
 
+                    if submit_signup:
+                        if id and gmail and password and name and confirm_password:
+                            if password != confirm_password:
+                                st.error("Passwords do not match!")
+                            else:
+                                signup_user(id, gmail, password, role, name)
+                        else:
+                            st.warning("Please fill all details...")
 
-# Initialize session state variables
-if 'logged_in' not in st.session_state:
-    st.session_state.logged_in = False
-if 'user_role' not in st.session_state:
-    st.session_state.user_role = None
-if 'user_name' not in st.session_state:
-    st.session_state.user_name = ''
-if 'user_id' not in st.session_state:
-    st.session_state.user_id = ''
+            col1, col2 = st.columns([1, 3])
+            with col1:
+                st.markdown(":blue[Already have an account?]")
+
+            with col2:
+                if st.button("Login"):
+                    st.session_state.show_login = True
+
+
+    # Initialize session state variables
+    if 'logged_in' not in st.session_state:
+        st.session_state.logged_in = False
+    if 'user_role' not in st.session_state:
+        st.session_state.user_role = None
+    if 'user_name' not in st.session_state:
+        st.session_state.user_name = ''
+    if 'user_id' not in st.session_state:
+        st.session_state.user_id = ''
+
+    # ROLE-BASED DASHBOARDS
+    if st.session_state.get('logged_in'):
+        if st.session_state.get('user_role') == "employee":
+            st.markdown(f"# 👋Welcome :blue[{st.session_state.get('user_name', 'Employee')}]")
+            employee_leave_page()
+        elif st.session_state.get('user_role') == "hr":
+            st.markdown(f"# 👋Welcome :blue[HR - {st.session_state.get('user_name', '')}]")
+            import leave_hr
+            leave_hr.hr_leave_page()
+        else:
+            st.error("Invalid user role. Please contact support.")
+            if st.button("Logout"):
+                st.session_state.clear()
+                st.rerun()
+finally:
+    # Query totals for this rerun; shown in the sidebar when DEBUG is on
+    rerun_summary = query_log.end_rerun()
 
-# ROLE-BASED DASHBOARDS
-if st.session_state.get('logged_in'):
-    if st.session_state.get('user_role') == "employee":
-        st.markdown(f"# 👋Welcome :blue[{st.session_state.get('user_name', 'Employee')}]")
-        employee_leave_page()
-    elif st.session_state.get('user_role') == "hr":
-        st.markdown(f"# 👋Welcome :blue[HR - {st.session_state.get('user_name', '')}]")
-        import leave_hr
-        leave_hr.hr_leave_page()
-    else:
-        st.error("Invalid user role. Please contact support.")
-        if st.button("Logout"):
-            st.session_state.clear()
-            st.rerun()
+# Only reached when the run was not interrupted by st.rerun()/st.stop()
+if rerun_summary and rerun_summary['stale']:
+    oldest = time.strftime('%H:%M:%S', time.localtime(min(rerun_summary['stale'].values())))
+    stale_banner.warning(f"⚠️ The database is responding slowly; data may be stale (last updated {oldest}).")
+if rerun_summary and os.getenv('DEBUG', '').lower() in ('1', 'true', 'yes'):
+    retries = sum(rerun_summary['retries'].values())
+    st.sidebar.caption(
+        f"🛢️ {rerun_summary['queries']} queries · {rerun_summary['db_time_ms']:.1f} ms in DB"
+        + (f" · {retries} retries" if retries else "")
+    )
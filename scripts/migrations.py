@@ -0,0 +1,364 @@
+"""
+Versioned schema migrations.
+
+Applied versions are recorded in the `schema_migrations` table, so running
+this script again only applies what is missing. Every migration is written
+to be idempotent (it checks INFORMATION_SCHEMA before changing anything)
+because MySQL DDL commits implicitly and cannot be rolled back.
+
+Usage:
+    python migrations.py           # apply pending migrations
+    python migrations.py status    # show applied / pending migrations
+"""
+import sys
+from datetime import date
+
+import pymysql
+from db import get_db_config
+
+LOCK_NAME = 'hr_schema_migrations'
+
+
+# ---------------------------------------------------------------- helpers
+
+def table_exists(cursor, table):
+    cursor.execute("""
+        SELECT 1 FROM INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (table,))
+    return cursor.fetchone() is not None
+
+
+def column_exists(cursor, table, column):
+    cursor.execute("""
+        SELECT 1 FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    return cursor.fetchone() is not None
+
+
+def index_exists(cursor, table, index):
+    cursor.execute("""
+        SELECT 1 FROM INFORMATION_SCHEMA.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        LIMIT 1
+    """, (table, index))
+    return cursor.fetchone() is not None
+
+
+def add_column(cursor, table, column, definition):
+    if not column_exists(cursor, table, column):
+        cursor.execute(f"ALTER TABLE `{table}` ADD COLUMN `{column}` {definition}")
+        print(f"  ✅ Added column {table}.{column}")
+
+
+def create_index(cursor, table, index, columns):
+    if not index_exists(cursor, table, index):
+        cursor.execute(f"CREATE INDEX `{index}` ON `{table}` ({columns})")
+        print(f"  ✅ Created index {table}.{index} ({columns})")
+
+
+# ------------------------------------------------------------- migrations
+
+def m001_base_tables(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id VARCHAR(50) PRIMARY KEY,
+            gmail VARCHAR(100) UNIQUE NOT NULL,
+            password VARCHAR(100) NOT NULL,
+            role ENUM('employee', 'hr') NOT NULL,
+            name VARCHAR(100) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS leave_requests (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id VARCHAR(50) NOT NULL,
+            name VARCHAR(100) NOT NULL,
+            start_date DATE NOT NULL,
+            end_date DATE NOT NULL,
+            reason TEXT NOT NULL,
+            status ENUM('pending', 'approved', 'rejected') DEFAULT 'pending',
+            hr_comment TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """)
+
+
+def m002_leave_request_columns(cursor):
+    # Older databases were created by scripts that lacked some of these columns
+    if not column_exists(cursor, 'leave_requests', 'name'):
+        add_column(cursor, 'leave_requests', 'name', "VARCHAR(100) AFTER user_id")
+        cursor.execute("""
+            UPDATE leave_requests lr
+            JOIN users u ON lr.user_id = u.id
+            SET lr.name = u.name
+        """)
+    add_column(cursor, 'leave_requests', 'hr_comment', "TEXT AFTER status")
+    add_column(cursor, 'leave_requests', 'created_at', "TIMESTAMP DEFAULT CURRENT_TIMESTAMP")
+    add_column(cursor, 'leave_requests', 'updated_at',
+               "TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP")
+
+
+def m003_index_status_created(cursor):
+    # HR tabs: WHERE status = %s ORDER BY created_at DESC, id DESC
+    create_index(cursor, 'leave_requests', 'idx_leave_status_created', 'status, created_at')
+
+
+def m004_index_user_status_start(cursor):
+    # Per-employee approved counts / history: WHERE user_id = %s AND status = 'approved'
+    create_index(cursor, 'leave_requests', 'idx_leave_user_status_start', 'user_id, status, start_date')
+
+
+def m005_index_user_created(cursor):
+    # Employee status page: WHERE user_id = %s ORDER BY created_at DESC
+    create_index(cursor, 'leave_requests', 'idx_leave_user_created', 'user_id, created_at')
+
+
+def m006_index_users_role_name(cursor):
+    # Employee directory: WHERE role IN (...) ORDER BY name
+    create_index(cursor, 'users', 'idx_users_role_name', 'role, name')
+
+
+def m007_index_users_name(cursor):
+    # Employee directory without a role filter: ORDER BY name, id LIMIT n
+    create_index(cursor, 'users', 'idx_users_name', 'name')
+
+
+def m008_leave_summary(cursor):
+    # Per-user, per-year counters read by the employee dashboard (see repository.py)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS leave_summary (
+            user_id VARCHAR(50) NOT NULL,
+            year SMALLINT NOT NULL,
+            total INT NOT NULL DEFAULT 0,
+            pending INT NOT NULL DEFAULT 0,
+            approved INT NOT NULL DEFAULT 0,
+            rejected INT NOT NULL DEFAULT 0,
+            approved_days INT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, year),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """)
+    from repository import rebuild_leave_summary
+    rows = rebuild_leave_summary(cursor)
+    print(f"  ✅ Backfilled leave_summary ({rows} rows)")
+
+
+def m009_leave_request_version(cursor):
+    # Optimistic concurrency: every status change bumps it (repository.set_leave_status)
+    add_column(cursor, 'leave_requests', 'version', "INT NOT NULL DEFAULT 0")
+
+
+def m010_partition_leave_requests(cursor):
+    # RANGE partitions on YEAR(start_date) (see partitions.py). MySQL requires
+    # the partitioning column in every unique key and allows no foreign keys
+    # on partitioned tables, so the primary key becomes (id, start_date) and
+    # the users FK's ON DELETE CASCADE moves into a trigger. The ALTER copies
+    # the table: run it in a quiet period on large databases.
+    from partitions import TABLE, YEARS_AHEAD, list_partitions, year_partitions
+
+    if list_partitions(cursor):
+        return
+
+    cursor.execute("""
+        SELECT CONSTRAINT_NAME FROM INFORMATION_SCHEMA.REFERENTIAL_CONSTRAINTS
+        WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (TABLE,))
+    for row in cursor.fetchall():
+        cursor.execute(f"ALTER TABLE {TABLE} DROP FOREIGN KEY `{row['CONSTRAINT_NAME']}`")
+        print(f"  ✅ Dropped foreign key {row['CONSTRAINT_NAME']}")
+    # The FK's index doubled as the user_id lookup index; keep one explicitly
+    create_index(cursor, TABLE, 'idx_leave_user_id', 'user_id')
+
+    cursor.execute("""
+        SELECT 1 FROM INFORMATION_SCHEMA.TRIGGERS
+        WHERE TRIGGER_SCHEMA = DATABASE() AND TRIGGER_NAME = 'users_delete_leave_requests'
+    """)
+    if cursor.fetchone() is None:
+        cursor.execute("""
+            CREATE TRIGGER users_delete_leave_requests AFTER DELETE ON users
+            FOR EACH ROW DELETE FROM leave_requests WHERE user_id = OLD.id
+        """)
+        print("  ✅ Created trigger users_delete_leave_requests")
+
+    cursor.execute(f"SELECT MIN(YEAR(start_date)) AS first_year FROM {TABLE}")
+    this_year = date.today().year
+    first_year = min(cursor.fetchone()['first_year'] or this_year, this_year)
+    cursor.execute(f"""
+        ALTER TABLE {TABLE}
+        DROP PRIMARY KEY,
+        ADD PRIMARY KEY (id, start_date),
+        PARTITION BY RANGE (YEAR(start_date)) (
+            {year_partitions(first_year, this_year + YEARS_AHEAD)}
+        )
+    """)
+    print(f"  ✅ Partitioned {TABLE} by year ({first_year}..{this_year + YEARS_AHEAD} + pmax)")
+
+
+def m011_leave_requests_archive(cursor):
+    # Cold storage for closed requests (archive_leave_requests.py); compressed
+    # pages since it is written once and rarely read
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS leave_requests_archive (
+            id INT PRIMARY KEY,
+            user_id VARCHAR(50) NOT NULL,
+            name VARCHAR(100) NOT NULL,
+            start_date DATE NOT NULL,
+            end_date DATE NOT NULL,
+            reason TEXT NOT NULL,
+            status ENUM('pending', 'approved', 'rejected') NOT NULL,
+            hr_comment TEXT,
+            created_at TIMESTAMP NULL,
+            updated_at TIMESTAMP NULL,
+            version INT NOT NULL DEFAULT 0,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_archive_user_created (user_id, created_at)
+        ) ENGINE=InnoDB ROW_FORMAT=COMPRESSED DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """)
+    # Deleting a user removes their archived requests as well
+    cursor.execute("DROP TRIGGER IF EXISTS users_delete_leave_requests")
+    cursor.execute("""
+        CREATE TRIGGER users_delete_leave_requests AFTER DELETE ON users
+        FOR EACH ROW BEGIN
+            DELETE FROM leave_requests WHERE user_id = OLD.id;
+            DELETE FROM leave_requests_archive WHERE user_id = OLD.id;
+        END
+    """)
+
+
+def m012_leave_type(cursor):
+    # Balances are tracked per leave type (balances.py); existing requests count as annual.
+    # Appended last (no AFTER) so MySQL 8 can add it in place instead of copying the table.
+    for table in ('leave_requests', 'leave_requests_archive'):
+        add_column(cursor, table, 'leave_type', "ENUM('annual', 'sick', 'casual') NOT NULL DEFAULT 'annual'")
+
+
+def m013_index_status_updated(cursor):
+    # Absence calendar refreshes read only the approvals since its last load (absence.py)
+    create_index(cursor, 'leave_requests', 'idx_leave_status_updated', 'status, updated_at')
+
+
+def m014_holidays(cursor):
+    # Per-region public holidays (holiday_calendar.py); users.region picks the
+    # calendar, NULL meaning HOLIDAY_DEFAULT_REGION
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS holidays (
+            region VARCHAR(20) NOT NULL,
+            holiday_date DATE NOT NULL,
+            name VARCHAR(100) NOT NULL,
+            PRIMARY KEY (region, holiday_date)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """)
+    add_column(cursor, 'users', 'region', "VARCHAR(20) NULL")
+    # leave_summary.approved_days now counts working days
+    from repository import rebuild_leave_summary
+    rows = rebuild_leave_summary(cursor)
+    print(f"  ✅ Recounted leave_summary in working days ({rows} rows)")
+
+
+# (version, description, function) -- append only, never renumber
+MIGRATIONS = [
+    (1, 'base users and leave_requests tables', m001_base_tables),
+    (2, 'leave_requests name/hr_comment/timestamp columns', m002_leave_request_columns),
+    (3, 'index leave_requests(status, created_at)', m003_index_status_created),
+    (4, 'index leave_requests(user_id, status, start_date)', m004_index_user_status_start),
+    (5, 'index leave_requests(user_id, created_at)', m005_index_user_created),
+    (6, 'index users(role, name)', m006_index_users_role_name),
+    (7, 'index users(name)', m007_index_users_name),
+    (8, 'leave_summary table', m008_leave_summary),
+    (9, 'leave_requests.version column', m009_leave_request_version),
+    (10, 'partition leave_requests by year', m010_partition_leave_requests),
+    (11, 'leave_requests_archive table', m011_leave_requests_archive),
+    (12, 'leave_requests.leave_type column', m012_leave_type),
+    (13, 'index leave_requests(status, updated_at)', m013_index_status_updated),
+    (14, 'holidays table and users.region', m014_holidays),
+]
+
+
+# ----------------------------------------------------------------- runner
+
+def _ensure_version_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """)
+
+
+def applied_versions(cursor):
+    _ensure_version_table(cursor)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row['version'] for row in cursor.fetchall()}
+
+
+def migrate(target=None):
+    """Apply every pending migration up to ``target`` (default: all). Returns versions applied."""
+    conn = pymysql.connect(**get_db_config())
+    applied = []
+    try:
+        with conn.cursor() as cursor:
+            # Serialise concurrent runners (e.g. two app instances starting together)
+            cursor.execute("SELECT GET_LOCK(%s, 60) AS locked", (LOCK_NAME,))
+            if not cursor.fetchone()['locked']:
+                raise RuntimeError("Another migration run holds the lock")
+            try:
+                done = applied_versions(cursor)
+                for version, description, func in sorted(MIGRATIONS, key=lambda m: m[0]):
+                    if version in done or (target is not None and version > target):
+                        continue
+                    print(f"➡️  Applying {version:03d}: {description}")
+                    func(cursor)
+                    cursor.execute(
+                        "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                        (version, description)
+                    )
+                    conn.commit()
+                    applied.append(version)
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return applied
+
+
+def status():
+    """Return [(version, description, applied?)] for every known migration"""
+    conn = pymysql.connect(**get_db_config())
+    try:
+        with conn.cursor() as cursor:
+            done = applied_versions(cursor)
+        conn.commit()
+    finally:
+        conn.close()
+    return [(version, description, version in done) for version, description, _ in MIGRATIONS]
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else 'migrate'
+    try:
+        if command == 'status':
+            for version, description, is_applied in status():
+                print(f"{'✅' if is_applied else '⏳'} {version:03d} {description}")
+        elif command == 'migrate':
+            applied = migrate()
+            if applied:
+                print(f"✅ Applied {len(applied)} migration(s)")
+            else:
+                print("✅ Database schema is up to date!")
+        else:
+            print(f"Unknown command: {command}")
+            print(__doc__)
+            sys.exit(2)
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        sys.exit(1)
@@ -0,0 +1,37 @@
+"""
+Overlap detection for leave date ranges.
+
+Ranges are inclusive [start, end] dates. `overlapping_pairs` is a sweep
+line: intervals are visited in start order while a min-heap keeps the ones
+still open (by end date), so each interval is compared only with the ones
+it actually overlaps. That is O(n log n + k) for n intervals and k
+overlapping pairs, instead of comparing every pair.
+"""
+import heapq
+from itertools import groupby
+
+
+def overlapping_pairs(intervals):
+    """Yield (earlier, later) item pairs whose ranges overlap.
+
+    ``intervals`` is an iterable of (start, end, item); it is sorted here
+    by start, so any order works.
+    """
+    active = []  # (end, seq, item) of intervals that may still overlap the next start
+    for seq, (start, end, item) in enumerate(sorted(intervals, key=lambda i: (i[0], i[1]))):
+        while active and active[0][0] < start:
+            heapq.heappop(active)
+        for _, _, other in active:
+            yield other, item
+        heapq.heappush(active, (end, seq, item))
+
+
+def overlapping_requests(rows):
+    """Yield (earlier, later) leave request rows of the same user that overlap.
+
+    ``rows`` are dicts with user_id, start_date and end_date, grouped by
+    user_id (e.g. ORDER BY user_id), so only one user's requests are held
+    in memory at a time.
+    """
+    for _, requests in groupby(rows, key=lambda row: row['user_id']):
+        yield from overlapping_pairs((row['start_date'], row['end_date'], row) for row in requests)
@@ -0,0 +1,123 @@
+"""
+Yearly RANGE partitions of leave_requests.
+
+leave_requests is partitioned on YEAR(start_date), one partition per year
+(p2024, p2025, ...) plus a catch-all `pmax`, so queries bounded on
+start_date only touch the years they ask for. This job keeps partitions
+for the next few years in place by splitting them off the (empty) pmax
+partition; run it from cron, e.g. monthly.
+
+Usage:
+    python partitions.py                 # ensure partitions up to DB_PARTITION_YEARS_AHEAD
+    python partitions.py status          # list partitions and their row estimates
+"""
+import os
+import sys
+from datetime import date
+
+import pymysql
+from db import get_db_config
+
+TABLE = 'leave_requests'
+YEARS_AHEAD = int(os.getenv('DB_PARTITION_YEARS_AHEAD', 2))
+
+
+def partition_name(year):
+    return f"p{year}"
+
+
+def year_partitions(first_year, last_year):
+    """PARTITION clauses for first_year..last_year followed by pmax"""
+    parts = [f"PARTITION {partition_name(year)} VALUES LESS THAN ({year + 1})"
+             for year in range(first_year, last_year + 1)]
+    parts.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+    return ',\n            '.join(parts)
+
+
+def list_partitions(cursor):
+    """[(name, upper bound or 'MAXVALUE', estimated rows)] in order, or [] if not partitioned"""
+    cursor.execute("""
+        SELECT PARTITION_NAME AS name, PARTITION_DESCRIPTION AS bound, TABLE_ROWS AS `rows`
+        FROM INFORMATION_SCHEMA.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """, (TABLE,))
+    return [(row['name'], row['bound'], row['rows'] or 0) for row in cursor.fetchall()]
+
+
+def ensure_future_partitions(cursor, years_ahead=YEARS_AHEAD, today=None):
+    """Split yearly partitions off pmax up to this year + years_ahead; returns the names added.
+
+    pmax normally holds no rows, so REORGANIZE PARTITION only rewrites an
+    empty partition and does not block the table for long.
+    """
+    partitions = list_partitions(cursor)
+    if not partitions:
+        raise RuntimeError(f"{TABLE} is not partitioned; run migrations.py first")
+    bounds = [int(bound) for _, bound, _ in partitions if bound != 'MAXVALUE']
+    last_year = max(bounds) - 1 if bounds else (today or date.today()).year - 1
+    target = (today or date.today()).year + years_ahead
+    if last_year >= target:
+        return []
+
+    new_years = range(last_year + 1, target + 1)
+    cursor.execute(f"""
+        ALTER TABLE {TABLE} REORGANIZE PARTITION pmax INTO (
+            {year_partitions(new_years.start, new_years.stop - 1)}
+        )
+    """)
+    return [partition_name(year) for year in new_years]
+
+
+def ensure_past_partitions(cursor, first_year):
+    """Split the oldest partition so every year from ``first_year`` on has its own; returns names added.
+
+    The oldest partition holds everything below its bound, so history
+    loaded after partitioning would otherwise pile up in it.
+    """
+    partitions = list_partitions(cursor)
+    if not partitions:
+        raise RuntimeError(f"{TABLE} is not partitioned; run migrations.py first")
+    oldest, bound, _ = partitions[0]
+    if bound == 'MAXVALUE' or first_year >= int(bound) - 1:
+        return []
+    years = range(first_year, int(bound))
+    parts = ',\n            '.join(f"PARTITION {partition_name(year)} VALUES LESS THAN ({year + 1})"
+                                   for year in years)
+    # The last new partition keeps the old upper bound, so no row changes hands beyond it
+    cursor.execute(f"""
+        ALTER TABLE {TABLE} REORGANIZE PARTITION {oldest} INTO (
+            {parts}
+        )
+    """)
+    return [partition_name(year) for year in years if partition_name(year) != oldest]
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else 'ensure'
+    conn = pymysql.connect(**get_db_config())
+    try:
+        with conn.cursor() as cursor:
+            if command == 'status':
+                for name, bound, rows in list_partitions(cursor):
+                    print(f"{name:>6}  < {bound:<8}  ~{rows:,} rows")
+            elif command == 'ensure':
+                added = ensure_future_partitions(cursor)
+                if added:
+                    print(f"✅ Added partitions {', '.join(added)}")
+                else:
+                    print(f"✅ Partitions already cover the next {YEARS_AHEAD} year(s)")
+            else:
+                print(f"Unknown command: {command}")
+                print(__doc__)
+                return 2
+    except Exception as e:
+        print(f"❌ Partition maintenance failed: {e}")
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""
+Query instrumentation for every cursor handed out by db.connect_db.
+
+Each execute() is timed and recorded with a normalised SQL fingerprint, the
+row count and the page/function that issued it. Queries slower than
+DB_SLOW_QUERY_MS go to the slow-query log (DB_SLOW_QUERY_LOG), and totals
+are kept per Streamlit rerun so repeated fingerprints (N+1 loops) stand out.
+"""
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+logger = logging.getLogger('hr.queries')
+slow_logger = logging.getLogger('hr.slow_query')
+
+SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', 200))
+# A fingerprint repeated this many times in one rerun is reported as a likely N+1
+REPEAT_WARNING = int(os.getenv('DB_REPEAT_QUERY_WARNING', 10))
+
+_slow_log_file = os.getenv('DB_SLOW_QUERY_LOG', 'slow_query.log')
+if _slow_log_file and not slow_logger.handlers:
+    _handler = logging.FileHandler(_slow_log_file, delay=True)
+    _handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+    slow_logger.addHandler(_handler)
+    slow_logger.setLevel(logging.INFO)
+
+# Frames from these modules are plumbing, not "the caller"
+_INTERNAL_MODULES = {'db', 'query_log', 'repository', 'contextlib'}
+
+_local = threading.local()
+
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\((?:\s*\?\s*,)*\s*\?\s*\)", re.IGNORECASE)
+_SPACE_RE = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """Normalise SQL so queries differing only in literals share one fingerprint"""
+    sql = sql.replace('%s', '?')
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+def _caller():
+    """Return 'module.function' of the nearest frame outside the DB plumbing"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if module not in _INTERNAL_MODULES:
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return 'unknown'
+
+
+class RerunStats:
+    """Query totals for one Streamlit script run"""
+
+    def __init__(self, label=''):
+        self.label = label
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time_ms = 0.0
+        self.rows = 0
+        self.retries = Counter()
+        self.stale = {}  # function -> time.time() its served result was fetched
+        self.fingerprints = Counter()
+        self.callers = Counter()
+
+    def as_dict(self):
+        return {
+            'label': self.label,
+            'queries': self.queries,
+            'db_time_ms': round(self.db_time_ms, 2),
+            'rows': self.rows,
+            'retries': dict(self.retries),
+            'stale': dict(self.stale),
+            'wall_time_ms': round((time.perf_counter() - self.started) * 1000, 2),
+            'top_fingerprints': self.fingerprints.most_common(5),
+            'callers': dict(self.callers),
+        }
+
+
+def start_rerun(label=''):
+    """Begin collecting totals for the current script run (call at the top of main.py)"""
+    _local.rerun = RerunStats(label)
+    return _local.rerun
+
+
+def current_rerun():
+    return getattr(_local, 'rerun', None)
+
+
+def end_rerun():
+    """Finish the current run, log its totals and warn about repeated fingerprints"""
+    stats = current_rerun()
+    if stats is None:
+        return None
+    _local.rerun = None
+    summary = stats.as_dict()
+    logger.info(
+        "rerun %s: %d queries, %.1f ms in DB, %d rows, %d retries",
+        stats.label or '-', stats.queries, stats.db_time_ms, stats.rows, sum(stats.retries.values())
+    )
+    for fp, count in stats.fingerprints.items():
+        if count >= REPEAT_WARNING:
+            logger.warning("rerun %s: query ran %d times (possible N+1): %s",
+                           stats.label or '-', count, fp)
+    return summary
+
+
+@contextmanager
+def capture():
+    """Collect (sql, args) of every statement executed on this thread inside the block"""
+    previous = getattr(_local, 'captured', None)
+    _local.captured = []
+    try:
+        yield _local.captured
+    finally:
+        _local.captured = previous
+
+
+def record(sql, duration_ms, rowcount, caller, args=None):
+    """Account for one executed statement"""
+    captured = getattr(_local, 'captured', None)
+    if captured is not None:
+        captured.append((sql, args))
+
+    fp = fingerprint(sql)
+    stats = current_rerun()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time_ms += duration_ms
+        stats.rows += max(rowcount or 0, 0)
+        stats.fingerprints[fp] += 1
+        stats.callers[caller] += 1
+
+    logger.debug("%.1f ms rows=%s caller=%s %s", duration_ms, rowcount, caller, fp)
+    if duration_ms >= SLOW_QUERY_MS:
+        slow_logger.info("%.1f ms rows=%s caller=%s %s", duration_ms, rowcount, caller, fp)
+
+
+def record_retry(reason):
+    """Account for one transaction retry (see db.run_transaction) in the current rerun"""
+    stats = current_rerun()
+    if stats is not None:
+        stats.retries[reason] += 1
+
+
+def record_stale(name, fetched_at):
+    """Note that ``name`` served a cached result from ``fetched_at`` in the current rerun"""
+    stats = current_rerun()
+    if stats is not None:
+        stats.stale[name] = min(fetched_at, stats.stale.get(name, fetched_at))
+
+
+class InstrumentedCursor:
+    """Wraps a pymysql cursor and records every execute()/executemany()"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def _timed(self, method, query, args):
+        caller = _caller()
+        start = time.perf_counter()
+        try:
+            return method(query, args)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            record(query, duration_ms, self._cursor.rowcount, caller, args)
+
+    def execute(self, query, args=None):
+        return self._timed(self._cursor.execute, query, args)
+
+    def executemany(self, query, args):
+        return self._timed(self._cursor.executemany, query, args)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
@@ -0,0 +1,31 @@
+"""
+Recompute the leave_summary table from leave_requests.
+
+The table is kept up to date incrementally by repository.create_leave_request
+and repository.set_leave_status. Run this after changing leave_requests by
+hand (SQL console, bulk fixes) or if the counters ever look wrong. Leave
+writes wait while it runs.
+
+Usage:
+    python rebuild_leave_summary.py
+"""
+import sys
+import time
+
+import repository
+
+
+def main():
+    print("🔄 Rebuilding leave_summary...")
+    started = time.perf_counter()
+    try:
+        rows = repository.rebuild_leave_summary()
+    except Exception as e:
+        print(f"❌ Rebuild failed: {e}")
+        return 1
+    print(f"✅ Wrote {rows:,} summary rows in {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
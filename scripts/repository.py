@@ -0,0 +1,998 @@
+"""
+Data access layer for users and leave requests.
+
+Every Streamlit page reads and writes through these functions, so the SQL,
+connection handling and any caching/batching live in exactly one place.
+All functions return plain dicts (DictCursor rows).
+"""
+import functools
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pymysql
+import query_log
+from db import PoolTimeoutError, connect_db, run_transaction
+
+logger = logging.getLogger('hr.repository')
+
+LEAVE_STATUSES = ('pending', 'approved', 'rejected')
+LEAVE_TYPES = ('annual', 'sick', 'casual')
+# Requests that hold their dates: a new request may not overlap one of these
+ACTIVE_STATUSES = ('pending', 'approved')
+# Longest request accepted, in calendar days. Range reads rely on it: a request
+# touching a window starts at most this long before it, which prunes partitions.
+MAX_LEAVE_DAYS = 366
+
+# Keyset position in a created_at DESC, id DESC listing
+PageCursor = Tuple[datetime, int]
+
+# Time budget for dashboard reads, enforced server-side by an optimizer hint
+READ_DEADLINE_MS = int(os.getenv('DB_READ_DEADLINE_MS', 2000))
+_DEADLINE = f"/*+ MAX_EXECUTION_TIME({READ_DEADLINE_MS}) */"
+STALE_CACHE_SIZE = int(os.getenv('DB_STALE_CACHE_SIZE', 512))
+
+# Closed requests that ended more than this many days ago live in the archive table
+ARCHIVE_TABLE = 'leave_requests_archive'
+ARCHIVE_RETENTION_DAYS = int(os.getenv('LEAVE_ARCHIVE_RETENTION_DAYS', 730))
+# Columns copied as-is between leave_requests and the archive
+ARCHIVE_COLUMNS = ('id', 'user_id', 'name', 'start_date', 'end_date', 'reason', 'status',
+                   'hr_comment', 'created_at', 'updated_at', 'version', 'leave_type')
+
+# 3024: maximum statement execution time exceeded; 2013: client read timeout
+_DEADLINE_ERRORS = (3024, 2013)
+
+
+class LeaveOverlapError(ValueError):
+    """A new leave request overlaps the user's pending or approved ones (``overlaps``)"""
+
+    def __init__(self, overlaps):
+        self.overlaps = overlaps
+        ranges = ', '.join(f"{row['start_date']} to {row['end_date']} ({row['status']})" for row in overlaps)
+        super().__init__(f"Overlaps existing leave: {ranges}")
+
+
+@contextmanager
+def _cursor(readonly=False):
+    """Yield a cursor on a pooled connection for reads.
+
+    readonly=True lets db.connect_db route the query to the read replica.
+    Writes go through db.run_transaction instead, which commits and retries
+    deadlocks and dropped connections.
+    """
+    conn = connect_db(readonly=readonly)
+    try:
+        with conn.cursor() as cur:
+            yield cur
+    finally:
+        conn.close()
+
+
+def _deadline_exceeded(error):
+    if isinstance(error, PoolTimeoutError):
+        return True
+    return isinstance(error, pymysql.err.OperationalError) and bool(error.args) \
+        and error.args[0] in _DEADLINE_ERRORS
+
+
+_last_good = OrderedDict()  # (function, args) -> (result, fetched_at)
+_last_good_lock = threading.Lock()
+_fallback_counters = Counter()
+
+
+def fallback_stats():
+    """How often dashboard reads ran out of time: deadline_exceeded, served_stale, no_stale_copy"""
+    with _last_good_lock:
+        return dict(_fallback_counters)
+
+
+def _cache_key(value):
+    """Hashable stand-in for a call argument: lists/tuples become tuples, sets frozensets"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_cache_key(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_cache_key(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _cache_key(v)) for k, v in value.items()))
+    return value
+
+
+def _stale_fallback(func):
+    """Remember the last good result of a dashboard read and serve it if a later call times out.
+
+    Stale results are reported to query_log so the page can show a banner.
+    Without a previous result the error is raised as before.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            key = (func.__name__, _cache_key(args), _cache_key(kwargs))
+            hash(key)
+        except TypeError:
+            logger.warning("%s called with unhashable arguments; no stale fallback for this call", func.__name__)
+            key = None
+        try:
+            result = func(*args, **kwargs)
+        except (pymysql.err.OperationalError, PoolTimeoutError) as e:
+            if key is None or not _deadline_exceeded(e):
+                raise
+            with _last_good_lock:
+                _fallback_counters['deadline_exceeded'] += 1
+                cached = _last_good.get(key)
+                _fallback_counters['served_stale' if cached else 'no_stale_copy'] += 1
+            if cached is None:
+                raise
+            logger.warning("%s ran out of time (%s); serving result from %s",
+                           func.__name__, e, time.strftime('%H:%M:%S', time.localtime(cached[1])))
+            query_log.record_stale(func.__name__, cached[1])
+            return cached[0]
+        if key is not None:
+            with _last_good_lock:
+                _last_good[key] = (result, time.time())
+                _last_good.move_to_end(key)
+                while len(_last_good) > STALE_CACHE_SIZE:
+                    _last_good.popitem(last=False)
+        return result
+    return wrapper
+
+
+# ---------------------------------------------------------------- users
+
+def get_user(user_id: str) -> Optional[Dict]:
+    """Return id, role, name, password and holiday region for a user, or None"""
+    with _cursor() as cur:
+        cur.execute("SELECT id, role, name, password, region FROM users WHERE id = %s", (user_id,))
+        return cur.fetchone()
+
+
+def find_user(user_id: str, gmail: str) -> Optional[Dict]:
+    """Return the first user matching either the ID or the email, or None"""
+    with _cursor() as cur:
+        cur.execute("SELECT id FROM users WHERE id = %s OR gmail = %s", (user_id, gmail))
+        return cur.fetchone()
+
+
+def create_user(user_id: str, gmail: str, password: str, role: str, name: str) -> None:
+    def work(cur):
+        cur.execute(
+            "INSERT INTO users (id, gmail, password, role, name) VALUES (%s, %s, %s, %s, %s)",
+            (user_id, gmail, password, role, name)
+        )
+    run_transaction(work)
+
+
+@_stale_fallback
+def list_users(roles: Iterable[str] = ('employee', 'hr')) -> List[Dict]:
+    """Return id, name, gmail and role of every user with one of the given roles, by name"""
+    roles = tuple(roles)
+    placeholders = ', '.join(['%s'] * len(roles))
+    with _cursor(readonly=True) as cur:
+        cur.execute(f"""
+            SELECT {_DEADLINE} id, name, gmail, role
+            FROM users
+            WHERE role IN ({placeholders})
+            ORDER BY name
+        """, roles)
+        return list(cur.fetchall())
+
+
+@_stale_fallback
+def count_users_by_role() -> Dict[str, int]:
+    """Return {role: number of users}"""
+    with _cursor(readonly=True) as cur:
+        cur.execute(f"SELECT {_DEADLINE} role, COUNT(*) AS count FROM users GROUP BY role")
+        return {row['role']: row['count'] for row in cur.fetchall()}
+
+
+@_stale_fallback
+def list_employee_directory(search: Optional[str] = None, role: Optional[str] = None,
+                            cursor: Optional[Tuple[str, str]] = None, limit: int = 25) -> List[Dict]:
+    """One page of the employee directory with leave aggregates, in a single query.
+
+    Users are ordered by (name, id); ``cursor`` is the (name, id) of the last
+    user already shown. ``search`` matches a name or ID prefix, ``role``
+    restricts to 'employee' or 'hr'. Each row carries approved_count,
+    pending_count and approved_days (working days) summed over the user's
+    leave_summary years, so archived requests still count. Only the page's
+    users are joined to leave_summary, so the cost does not grow with
+    headcount.
+    """
+    where = []
+    params = []
+    if role:
+        where.append("role = %s")
+        params.append(role)
+    if search:
+        where.append("(name LIKE %s OR id LIKE %s)")
+        prefix = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        params.extend([prefix, prefix])
+    if cursor is not None:
+        where.append("(name > %s OR (name = %s AND id > %s))")
+        params.extend([cursor[0], cursor[0], cursor[1]])
+    params.append(limit)
+
+    sql = f"""
+        SELECT {_DEADLINE} p.id, p.name, p.gmail, p.role,
+               COALESCE(SUM(s.approved), 0) AS approved_count,
+               COALESCE(SUM(s.pending), 0) AS pending_count,
+               COALESCE(SUM(s.approved_days), 0) AS approved_days
+        FROM (
+            SELECT id, name, gmail, role
+            FROM users
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+            ORDER BY name, id
+            LIMIT %s
+        ) p
+        LEFT JOIN leave_summary s ON s.user_id = p.id
+        GROUP BY p.id, p.name, p.gmail, p.role
+        ORDER BY p.name, p.id
+    """
+    with _cursor(readonly=True) as cur:
+        cur.execute(sql, params)
+        return list(cur.fetchall())
+
+
+# ------------------------------------------------------- leave requests
+
+def _year_bounds(year):
+    """[Jan 1 of year, Jan 1 of year + 1): a sargable start_date range, so MySQL
+    prunes leave_requests to that year's partition"""
+    return date(year, 1, 1), date(year + 1, 1, 1)
+
+
+def _leave_page_query(status, cursor, limit, year=None):
+    # The requester's role (staffing check) and region (working days): a
+    # primary-key lookup per row of the page
+    sql = f"""
+        SELECT {_DEADLINE} lr.id, lr.user_id, lr.name, lr.start_date, lr.end_date, lr.leave_type,
+               lr.reason, lr.status, lr.created_at, lr.version,
+               COALESCE(lr.hr_comment, '') as hr_comment, COALESCE(u.role, 'employee') AS role, u.region
+        FROM leave_requests lr
+        LEFT JOIN users u ON u.id = lr.user_id
+        WHERE lr.status = %s
+    """
+    params = [status]
+    if year is not None:
+        sql += " AND lr.start_date >= %s AND lr.start_date < %s"
+        params.extend(_year_bounds(year))
+    if cursor is not None:
+        sql += " AND (lr.created_at < %s OR (lr.created_at = %s AND lr.id < %s))"
+        params.extend([cursor[0], cursor[0], cursor[1]])
+    sql += " ORDER BY lr.created_at DESC, lr.id DESC"
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit)
+    return sql, params
+
+
+@_stale_fallback
+def list_leave_requests(status: str, cursor: Optional[PageCursor] = None,
+                        limit: Optional[int] = None, year: Optional[int] = None) -> List[Dict]:
+    """Return leave requests with the given status, newest first.
+
+    ``cursor`` is the (created_at, id) of the last row already shown; only
+    rows after it are returned. ``limit`` caps the number of rows. ``year``
+    keeps requests starting in that year (reads one partition).
+    """
+    with _cursor(readonly=True) as cur:
+        cur.execute(*_leave_page_query(status, cursor, limit, year))
+        return list(cur.fetchall())
+
+
+@_stale_fallback
+def load_leave_tab(status: str, cursor: Optional[PageCursor] = None,
+                   limit: Optional[int] = None, year: Optional[int] = None,
+                   count_years: Optional[Dict[str, Optional[int]]] = None) -> Tuple[Dict[str, int], List[Dict]]:
+    """Everything the HR status tabs need for one rerun, on a single connection:
+    per-status counts for the tab labels and one page of the selected status
+    (optionally only requests starting in ``year``).
+
+    ``count_years`` limits each status's count to requests starting in that
+    year, the way its tab filters its list (missing or None: all years).
+    """
+    count_years = count_years or {}
+    selects, params = [], []
+    for s in LEAVE_STATUSES:
+        sql = "SELECT status, COUNT(*) AS count FROM leave_requests WHERE status = %s"
+        params.append(s)
+        if count_years.get(s) is not None:
+            sql += " AND start_date >= %s AND start_date < %s"
+            params.extend(_year_bounds(count_years[s]))
+        selects.append(sql + " GROUP BY status")
+    # The hint after the first SELECT applies to the whole UNION
+    count_sql = selects[0].replace("SELECT", f"SELECT {_DEADLINE}", 1) + "".join(
+        " UNION ALL " + sql for sql in selects[1:])
+    with _cursor(readonly=True) as cur:
+        cur.execute(count_sql, params)
+        counts = {row['status']: row['count'] for row in cur.fetchall()}
+        cur.execute(*_leave_page_query(status, cursor, limit, year))
+        rows = list(cur.fetchall())
+    return {s: counts.get(s, 0) for s in LEAVE_STATUSES}, rows
+
+
+def archive_horizon(today: Optional[date] = None) -> date:
+    """Requests ending before this date may have been moved to the archive"""
+    return (today or date.today()) - timedelta(days=ARCHIVE_RETENTION_DAYS)
+
+
+@_stale_fallback
+def list_user_leave_requests(user_id: str, status: Optional[str] = None,
+                             since: Optional[date] = None) -> List[Dict]:
+    """Return a user's leave requests (optionally only one status), newest first.
+
+    ``since`` keeps requests starting on or after that date, which limits the
+    read to the partitions of those years. When the window reaches back past
+    archive_horizon() the archived requests are included too (archived=1).
+    """
+    where = "user_id = %s"
+    params = [user_id]
+    if status is not None:
+        where += " AND status = %s"
+        params.append(status)
+    if since is not None:
+        where += " AND start_date >= %s"
+        params.append(since)
+    columns = """id, start_date, end_date, leave_type, reason, status,
+               COALESCE(hr_comment, '') as hr_comment,
+               created_at"""
+
+    sql = f"""
+        SELECT {_DEADLINE} {columns}, 0 AS archived
+        FROM leave_requests
+        WHERE {where}
+    """
+    if since is None or since < archive_horizon():
+        sql += f"""
+        UNION ALL
+        SELECT {columns}, 1 AS archived
+        FROM {ARCHIVE_TABLE}
+        WHERE {where}
+        """
+        params = params * 2
+    sql += " ORDER BY created_at DESC"
+
+    with _cursor(readonly=True) as cur:
+        cur.execute(sql, params)
+        return list(cur.fetchall())
+
+
+@_stale_fallback
+def count_leaves_by_user(user_ids: Optional[Iterable[str]] = None,
+                         status: str = 'approved') -> Dict[str, int]:
+    """Return {user_id: number of requests with ``status``} in a single grouped query.
+
+    Users without matching requests are absent from the result.
+    """
+    sql = f"SELECT {_DEADLINE} user_id, COUNT(*) as count FROM leave_requests WHERE status = %s"
+    params = [status]
+    if user_ids is not None:
+        user_ids = tuple(user_ids)
+        if not user_ids:
+            return {}
+        sql += f" AND user_id IN ({', '.join(['%s'] * len(user_ids))})"
+        params.extend(user_ids)
+    sql += " GROUP BY user_id"
+
+    with _cursor(readonly=True) as cur:
+        cur.execute(sql, params)
+        return {row['user_id']: row['count'] for row in cur.fetchall()}
+
+
+REPORT_COLUMNS = (
+    'id', 'user_id', 'name', 'gmail', 'role', 'region', 'start_date', 'end_date', 'days', 'working_days',
+    'leave_type',
+    'reason', 'status', 'hr_comment', 'created_at', 'updated_at'
+)
+
+
+def iter_leave_report(status: Optional[str] = None, date_from: Optional[date] = None,
+                      date_to: Optional[date] = None, user_id: Optional[str] = None,
+                      include_archive: bool = True) -> Iterator[Dict]:
+    """Stream leave requests joined with their user, oldest first, one row at a time.
+
+    Uses an unbuffered server-side cursor (SSDictCursor), so memory stays
+    constant however many rows match. All filters are applied in SQL; the
+    date range keeps requests overlapping [date_from, date_to]. Archived
+    requests (all older than the live ones) come first unless
+    include_archive=False. ``days`` counts calendar days, ``working_days``
+    the working days of the requester's holiday calendar.
+    The connection is held until the generator is exhausted or closed.
+    """
+    tables = [ARCHIVE_TABLE, 'leave_requests'] if include_archive else ['leave_requests']
+    for table in tables:
+        yield from _iter_report_table(table, status, date_from, date_to, user_id)
+
+
+def iter_active_requests() -> Iterator[Dict]:
+    """Stream every pending/approved request (id, user_id, name, dates, status) grouped by user_id.
+
+    Rows come in (user_id, status, start_date) order, the order of
+    idx_leave_user_status_start, so no sort is needed on the server.
+    """
+    sql = f"""
+        SELECT id, user_id, name, start_date, end_date, status
+        FROM leave_requests
+        WHERE status IN ({', '.join(['%s'] * len(ACTIVE_STATUSES))})
+        ORDER BY user_id, status, start_date
+    """
+    conn = connect_db(readonly=True)
+    try:
+        with conn.cursor(pymysql.cursors.SSDictCursor) as cur:
+            cur.execute(sql, ACTIVE_STATUSES)
+            for row in cur:
+                yield row
+    finally:
+        conn.close()
+
+
+def _iter_report_table(table, status, date_from, date_to, user_id):
+    sql = f"""
+        SELECT lr.id, lr.user_id, lr.name, u.gmail, u.role, u.region,
+               lr.start_date, lr.end_date,
+               DATEDIFF(lr.end_date, lr.start_date) + 1 AS days, lr.leave_type,
+               lr.reason, lr.status, lr.hr_comment, lr.created_at, lr.updated_at
+        FROM {table} lr
+        LEFT JOIN users u ON u.id = lr.user_id
+        WHERE 1 = 1
+    """
+    params = []
+    if status is not None:
+        sql += " AND lr.status = %s"
+        params.append(status)
+    if user_id is not None:
+        sql += " AND lr.user_id = %s"
+        params.append(user_id)
+    if date_from is not None:
+        sql += " AND lr.end_date >= %s"
+        params.append(date_from)
+    if date_to is not None:
+        sql += " AND lr.start_date <= %s"
+        params.append(date_to)
+    sql += " ORDER BY lr.id"
+
+    calendars = {}
+    conn = connect_db(readonly=True)
+    try:
+        with conn.cursor(pymysql.cursors.SSDictCursor) as cur:
+            cur.execute(sql, params)
+            for row in cur:
+                if row['region'] not in calendars:
+                    calendars[row['region']] = _calendar(row['region'])
+                row['working_days'] = calendars[row['region']].working_days(row['start_date'], row['end_date'])
+                yield row
+    finally:
+        conn.close()
+
+
+# Index range on idx_leave_user_status_start: only the user's active requests starting before end_date
+_OVERLAP_SQL = f"""
+    SELECT id, start_date, end_date, status
+    FROM leave_requests
+    WHERE user_id = %s AND status IN ({', '.join(['%s'] * len(ACTIVE_STATUSES))})
+      AND start_date <= %s AND end_date >= %s
+    ORDER BY start_date
+"""
+
+
+def find_overlapping_requests(user_id: str, start_date: date, end_date: date, cur=None) -> List[Dict]:
+    """The user's pending/approved requests sharing a day with [start_date, end_date].
+
+    Pass ``cur`` to read inside a caller's transaction (create_leave_request
+    does, under its lock on the user row).
+    """
+    if cur is None:
+        with _cursor(readonly=True) as cur:
+            return find_overlapping_requests(user_id, start_date, end_date, cur)
+    cur.execute(_OVERLAP_SQL, (user_id, *ACTIVE_STATUSES, end_date, start_date))
+    return list(cur.fetchall())
+
+
+def create_leave_request(user_id: str, name: str, start_date: date, end_date: date,
+                         reason: str, leave_type: str = 'annual') -> int:
+    """Insert a pending leave request and return its id.
+
+    Raises ValueError for a range longer than MAX_LEAVE_DAYS and
+    LeaveOverlapError if it overlaps one of the user's pending or approved
+    requests. The user's row is locked first, so two concurrent
+    submissions by the same user cannot both pass the check.
+    """
+    if leave_type not in LEAVE_TYPES:
+        raise ValueError(f"Unknown leave type: {leave_type}")
+    if (end_date - start_date).days + 1 > MAX_LEAVE_DAYS:
+        raise ValueError(f"Leave longer than {MAX_LEAVE_DAYS} days")
+
+    def work(cur):
+        cur.execute("SELECT id FROM users WHERE id = %s FOR UPDATE", (user_id,))
+        overlaps = find_overlapping_requests(user_id, start_date, end_date, cur)
+        if overlaps:
+            raise LeaveOverlapError(overlaps)
+        cur.execute("""
+            INSERT INTO leave_requests
+            (user_id, name, start_date, end_date, leave_type, reason, status)
+            VALUES (%s, %s, %s, %s, %s, %s, 'pending')
+        """, (user_id, name, start_date, end_date, leave_type, reason))
+        request_id = cur.lastrowid
+        _apply_summary(cur, user_id, _summary_deltas(start_date, end_date, 'pending'))
+        return request_id
+    return run_transaction(work)
+
+
+# Review decisions: a request moves from pending to one of these exactly once
+DECISIONS = ('approved', 'rejected')
+
+
+def set_leave_status(request_id: int, status: str, comment: Optional[str] = None,
+                     expected_version: Optional[int] = None) -> Dict:
+    """Decide a pending request (approve/reject) as a compare-and-set transition.
+
+    The UPDATE only matches while the request is still pending and, when
+    ``expected_version`` is given, still at the version the reviewer saw, so
+    concurrent reviewers never overwrite each other and no row is locked
+    before the write. Returns {'outcome', 'request'} where outcome is
+    'updated', 'conflict' (someone else decided or changed it first) or
+    'not_found'; request is the row as it now stands (None if not found).
+    """
+    if status not in DECISIONS:
+        raise ValueError(f"Pending requests can only be approved or rejected, not {status}")
+
+    params = [status]
+    comment_sql = ''
+    if comment and comment.strip():
+        comment_sql = 'hr_comment = %s,'
+        params.append(comment.strip())
+    sql = f"""
+        UPDATE leave_requests
+        SET status = %s,
+            {comment_sql}
+            version = version + 1,
+            updated_at = NOW()
+        WHERE id = %s AND status = 'pending'
+    """
+    params.append(request_id)
+    if expected_version is not None:
+        sql += " AND version = %s"
+        params.append(expected_version)
+
+    def work(cur):
+        cur.execute(sql, params)
+        updated = cur.rowcount == 1
+        cur.execute("""
+            SELECT lr.id, lr.user_id, lr.name, lr.start_date, lr.end_date, lr.status, lr.version,
+                   COALESCE(lr.hr_comment, '') as hr_comment, lr.updated_at, COALESCE(u.role, 'employee') AS role,
+                   u.region
+            FROM leave_requests lr
+            LEFT JOIN users u ON u.id = lr.user_id
+            WHERE lr.id = %s
+        """, (request_id,))
+        row = cur.fetchone()
+        if updated:
+            deltas = _summary_deltas(row['start_date'], row['end_date'], 'pending', -1)
+            calendar = _calendar(row['region'], cur) if status == 'approved' else None
+            for key, delta in _summary_deltas(row['start_date'], row['end_date'], status, calendar=calendar).items():
+                deltas[key] += delta
+            _apply_summary(cur, row['user_id'], deltas)
+        return updated, row
+
+    updated, row = run_transaction(work)
+    if row is None:
+        return {'outcome': 'not_found', 'request': None}
+    return {'outcome': 'updated' if updated else 'conflict', 'request': row}
+
+
+def bulk_set_leave_status(request_ids: Iterable[int], status: str,
+                          comment: Optional[str] = None) -> Dict[int, str]:
+    """Move many pending requests to ``status`` with one set-based UPDATE in one transaction.
+
+    The same HR comment (if given) is applied to every request. Rows another
+    reviewer is deciding at this moment are skipped rather than waited for.
+    Returns {request_id: outcome} where outcome is 'updated', 'conflict'
+    (being decided by someone else right now), 'not_pending' (already
+    approved/rejected) or 'not_found'.
+    """
+    if status not in DECISIONS:
+        raise ValueError(f"Pending requests can only be approved or rejected, not {status}")
+    request_ids = sorted({int(request_id) for request_id in request_ids})
+    if not request_ids:
+        return {}
+    placeholders = ', '.join(['%s'] * len(request_ids))
+
+    def work(cur):
+        # Claim the still-pending rows nobody else holds (MySQL 8.0+); the
+        # outcomes and summary deltas then match exactly what the UPDATE changes
+        cur.execute(f"""
+            SELECT lr.id, lr.user_id, lr.start_date, lr.end_date, u.region
+            FROM leave_requests lr
+            LEFT JOIN users u ON u.id = lr.user_id
+            WHERE lr.id IN ({placeholders}) AND lr.status = 'pending'
+            FOR UPDATE OF lr SKIP LOCKED
+        """, request_ids)
+        claimed = list(cur.fetchall())
+
+        if claimed:
+            params = [status]
+            comment_sql = ''
+            if comment and comment.strip():
+                comment_sql = 'hr_comment = %s,'
+                params.append(comment.strip())
+            params.extend(row['id'] for row in claimed)
+            cur.execute(f"""
+                UPDATE leave_requests
+                SET status = %s,
+                    {comment_sql}
+                    version = version + 1,
+                    updated_at = NOW()
+                WHERE id IN ({', '.join(['%s'] * len(claimed))}) AND status = 'pending'
+            """, params)
+
+            deltas_by_user = defaultdict(lambda: defaultdict(int))
+            calendars = {}
+            for row in claimed:
+                deltas = deltas_by_user[row['user_id']]
+                if status == 'approved' and row['region'] not in calendars:
+                    calendars[row['region']] = _calendar(row['region'], cur)
+                calendar = calendars.get(row['region'])
+                for sign, row_status in ((-1, 'pending'), (1, status)):
+                    for key, delta in _summary_deltas(row['start_date'], row['end_date'], row_status, sign,
+                                                      calendar).items():
+                        deltas[key] += delta
+            for user_id in sorted(deltas_by_user):
+                _apply_summary(cur, user_id, deltas_by_user[user_id])
+
+        # Classify the rest with a plain (non-locking) read
+        claimed_ids = {row['id'] for row in claimed}
+        others = [request_id for request_id in request_ids if request_id not in claimed_ids]
+        current = {}
+        if others:
+            cur.execute(f"""
+                SELECT id, status FROM leave_requests
+                WHERE id IN ({', '.join(['%s'] * len(others))})
+            """, others)
+            current = {row['id']: row['status'] for row in cur.fetchall()}
+        return claimed_ids, current
+
+    claimed_ids, current = run_transaction(work)
+    outcomes = {}
+    for request_id in request_ids:
+        if request_id in claimed_ids:
+            outcomes[request_id] = 'updated'
+        elif request_id not in current:
+            outcomes[request_id] = 'not_found'
+        elif current[request_id] == 'pending':
+            outcomes[request_id] = 'conflict'
+        else:
+            outcomes[request_id] = 'not_pending'
+    return outcomes
+
+
+# --------------------------------------------------------- leave summary
+#
+# leave_summary holds per-user, per-year counters so the dashboard never has to
+# scan leave_requests. A request counts towards the year it starts in; approved
+# days are split across the calendar years the leave covers. Writers update it
+# in the same transaction as the leave_requests change, always locking
+# leave_requests first and leave_summary second.
+
+SUMMARY_COLUMNS = ('total', 'pending', 'approved', 'rejected', 'approved_days')
+
+
+def _calendar(region, cur=None, with_holidays=True):
+    """holiday_calendar.WorkingCalendar of ``region``.
+
+    With ``cur`` the holidays are read inside the caller's transaction on
+    every call, never taken from the per-process cache: leave_summary must
+    count with the holidays as committed, or it drifts from what
+    rebuild_leave_summary would write.
+    """
+    # holiday_calendar reads its holidays through this module, so import it late
+    import holiday_calendar
+    if not with_holidays:
+        return holiday_calendar.WorkingCalendar(region or holiday_calendar.DEFAULT_REGION, {})
+    if cur is not None:
+        return holiday_calendar.load_calendar(region, cur)
+    return holiday_calendar.calendar_for(region)
+
+
+def _summary_deltas(start_date: date, end_date: date, status: str, sign: int = 1, calendar=None):
+    """{(year, column): delta} contributed by one request with the given status.
+
+    approved_days counts the working days of ``calendar`` (a
+    holiday_calendar.WorkingCalendar); it is required for approved requests.
+    """
+    deltas = defaultdict(int)
+    deltas[(start_date.year, 'total')] += sign
+    deltas[(start_date.year, status)] += sign
+    if status == 'approved':
+        day = start_date
+        while day <= end_date:
+            year_end = min(end_date, date(day.year, 12, 31))
+            deltas[(day.year, 'approved_days')] += sign * calendar.working_days(day, year_end)
+            day = year_end + timedelta(days=1)
+    return deltas
+
+
+def _apply_summary(cur, user_id, deltas):
+    """Add ``deltas`` ({(year, column): n}) to the user's leave_summary rows"""
+    by_year = defaultdict(dict)
+    for (year, column), delta in deltas.items():
+        if delta:
+            by_year[year][column] = delta
+    for year, changes in sorted(by_year.items()):
+        values = [changes.get(column, 0) for column in SUMMARY_COLUMNS]
+        cur.execute(f"""
+            INSERT INTO leave_summary (user_id, year, {', '.join(SUMMARY_COLUMNS)})
+            VALUES (%s, %s, {', '.join(['%s'] * len(SUMMARY_COLUMNS))})
+            ON DUPLICATE KEY UPDATE
+                {', '.join(f"{c} = {c} + VALUES({c})" for c in SUMMARY_COLUMNS)}
+        """, [user_id, year] + values)
+
+
+@_stale_fallback
+def get_leave_summary(user_id: str, year: Optional[int] = None) -> Dict[str, int]:
+    """Return the user's counters for ``year`` (default: this year) by primary key.
+
+    Keys: total, pending, approved, rejected, approved_days (all 0 if the user
+    has no requests that year).
+    """
+    year = year or date.today().year
+    with _cursor(readonly=True) as cur:
+        cur.execute(f"""
+            SELECT {_DEADLINE} {', '.join(SUMMARY_COLUMNS)}
+            FROM leave_summary
+            WHERE user_id = %s AND year = %s
+        """, (user_id, year))
+        row = cur.fetchone()
+    return {column: int(row[column]) if row else 0 for column in SUMMARY_COLUMNS}
+
+
+def rebuild_leave_summary(cur=None, user_id: Optional[str] = None) -> int:
+    """Recompute leave_summary from leave_requests (and the archive) in one transaction; returns rows written.
+
+    The share-mode read holds off concurrent leave writes until commit, so no
+    increment can slip in between the scan and the rewrite. Pass ``cur`` to
+    run inside a caller's transaction (the caller commits), ``user_id`` to
+    recompute only that user's rows.
+    """
+    if cur is None:
+        return run_transaction(lambda cur: rebuild_leave_summary(cur, user_id))
+
+    only_user, user_params = ("", None) if user_id is None else (" AND user_id = %s", (user_id,))
+
+    totals = defaultdict(lambda: defaultdict(int))
+    # Each user's holiday region (users.region and the holidays table exist
+    # from migration 14 on; before that only weekends are skipped)
+    regions, calendars = {}, {}
+    cur.execute("""
+        SELECT 1 FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'users' AND COLUMN_NAME = 'region'
+    """)
+    has_holidays = cur.fetchone() is not None
+    if has_holidays:
+        cur.execute("SELECT id, region FROM users WHERE region IS NOT NULL"
+                    + ("" if user_id is None else " AND id = %s"), user_params)
+        regions = {row['id']: row['region'] for row in cur.fetchall()}
+    statements = [f"""
+        SELECT user_id, start_date, end_date, status
+        FROM leave_requests
+        WHERE 1 = 1{only_user}
+        LOCK IN SHARE MODE
+    """]
+    # Archived requests still count (the table exists from migration 11 on)
+    cur.execute("""
+        SELECT 1 FROM INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (ARCHIVE_TABLE,))
+    if cur.fetchone():
+        statements.append(f"SELECT user_id, start_date, end_date, status FROM {ARCHIVE_TABLE} "
+                          f"WHERE 1 = 1{only_user} LOCK IN SHARE MODE")
+    for sql in statements:
+        cur.execute(sql, user_params)
+        requests = list(cur.fetchall())
+        for row in requests:
+            region = regions.get(row['user_id'])
+            if region not in calendars:
+                calendars[region] = _calendar(region, cur if has_holidays else None, has_holidays)
+            user_totals = totals[row['user_id']]
+            for key, delta in _summary_deltas(row['start_date'], row['end_date'], row['status'],
+                                              calendar=calendars[region]).items():
+                user_totals[key] += delta
+
+    rows = []
+    for user_id, user_totals in totals.items():
+        for year in sorted({year for year, _ in user_totals}):
+            rows.append([user_id, year] + [user_totals.get((year, column), 0) for column in SUMMARY_COLUMNS])
+
+    cur.execute("DELETE FROM leave_summary WHERE 1 = 1" + only_user, user_params)
+    if rows:
+        cur.executemany(f"""
+            INSERT INTO leave_summary (user_id, year, {', '.join(SUMMARY_COLUMNS)})
+            VALUES (%s, %s, {', '.join(['%s'] * len(SUMMARY_COLUMNS))})
+        """, rows)
+    return len(rows)
+
+
+# -------------------------------------------------------------- holidays
+
+def list_holidays(region: str, cur=None) -> Dict[date, str]:
+    """{date: name} of the region's public holidays.
+
+    ``cur`` reads inside a caller's transaction, with a share lock so the
+    latest committed holidays are seen and a concurrent load waits.
+    """
+    sql = "SELECT holiday_date, name FROM holidays WHERE region = %s"
+    if cur is not None:
+        cur.execute(sql + " LOCK IN SHARE MODE", (region,))
+        return {row['holiday_date']: row['name'] for row in cur.fetchall()}
+    with _cursor(readonly=True) as cur:
+        cur.execute(sql, (region,))
+        return {row['holiday_date']: row['name'] for row in cur.fetchall()}
+
+
+def set_user_region(user_id: str, region: Optional[str]) -> bool:
+    """Move a user to another holiday calendar (None: the default region).
+
+    Their leave_summary rows are recounted in the same transaction, since
+    approved_days counts working days of the user's region. Returns False if
+    there is no such user. Change users.region only through here (or run
+    rebuild_leave_summary.py afterwards).
+    """
+    def work(cur):
+        cur.execute("SELECT id FROM users WHERE id = %s FOR UPDATE", (user_id,))
+        if cur.fetchone() is None:
+            return False
+        cur.execute("UPDATE users SET region = %s WHERE id = %s", (region, user_id))
+        rebuild_leave_summary(cur, user_id)
+        return True
+    return run_transaction(work)
+
+
+def upsert_holidays(rows: Iterable[Tuple[str, date, str]]) -> None:
+    """Insert or rename holidays given as (region, date, name)"""
+    rows = list(rows)
+
+    def work(cur):
+        cur.executemany("""
+            INSERT INTO holidays (region, holiday_date, name) VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE name = VALUES(name)
+        """, rows)
+    if rows:
+        run_transaction(work)
+
+
+
+# -------------------------------------------------------------- balances
+
+def epoch_day(day: date) -> int:
+    """Days since 1970-01-01: how the bulk loaders below return dates"""
+    return (day - date(1970, 1, 1)).days
+
+
+def load_balance_inputs(first_year: int, last_year: int,
+                        user_id: Optional[str] = None) -> Tuple[List[Tuple], List[Tuple]]:
+    """Raw inputs for balances.py: ([(user_id, region, joined_year, joined_month)],
+    [(user_id, leave_type, status, start_day, end_day)]); joined is from users.created_at.
+
+    Requests are the approved and pending ones touching first_year..last_year
+    (archived ones too when the window reaches the archive). Rows are plain
+    tuples, not dicts, and dates come as days since 1970-01-01, since this
+    reads every employee's requests at once and NumPy loads ints far faster
+    than date objects.
+    Pass ``user_id`` to load a single employee.
+    """
+    window_start, window_end = date(first_year, 1, 1), date(last_year, 12, 31)
+    # A request touching the window started at most MAX_LEAVE_DAYS before it: prunes older partitions
+    where = """status IN ('approved', 'pending')
+               AND start_date >= %s AND start_date <= %s AND end_date >= %s"""
+    params = [window_start - timedelta(days=MAX_LEAVE_DAYS), window_end, window_start]
+    if user_id is not None:
+        where += " AND user_id = %s"
+        params.append(user_id)
+    columns = """user_id, leave_type, status,
+                 DATEDIFF(start_date, '1970-01-01') AS start_day, DATEDIFF(end_date, '1970-01-01') AS end_day"""
+    sql = f"SELECT {columns} FROM leave_requests WHERE {where}"
+    if window_start < archive_horizon():
+        sql += f" UNION ALL SELECT {columns} FROM {ARCHIVE_TABLE} WHERE {where}"
+        params = params * 2
+
+    conn = connect_db(readonly=True)
+    try:
+        with conn.cursor(pymysql.cursors.Cursor) as cur:
+            if user_id is None:
+                cur.execute("SELECT id, region, YEAR(created_at), MONTH(created_at) FROM users")
+            else:
+                cur.execute("SELECT id, region, YEAR(created_at), MONTH(created_at) FROM users WHERE id = %s",
+                            (user_id,))
+            users = list(cur.fetchall())
+            cur.execute(sql, params)
+            return users, list(cur.fetchall())
+    finally:
+        conn.close()
+
+
+# ------------------------------------------------------ absence calendar
+
+def _approved_intervals_query(date_from, date_to, updated_since=None):
+    # A request touching the window started at most MAX_LEAVE_DAYS before it: prunes older partitions
+    where = """lr.status = 'approved'
+               AND lr.start_date >= %s AND lr.start_date <= %s AND lr.end_date >= %s"""
+    params = [date_from - timedelta(days=MAX_LEAVE_DAYS), date_to, date_from]
+    if updated_since is not None:
+        where += " AND lr.updated_at >= %s"
+        params.append(updated_since)
+    columns = """lr.id, u.role, DATEDIFF(lr.start_date, '1970-01-01') AS start_day,
+                 DATEDIFF(lr.end_date, '1970-01-01') AS end_day, lr.updated_at"""
+    sql = f"SELECT {columns} FROM leave_requests lr JOIN users u ON u.id = lr.user_id WHERE {where}"
+    if updated_since is None and date_from < archive_horizon():
+        sql += f" UNION ALL SELECT {columns} FROM {ARCHIVE_TABLE} lr JOIN users u ON u.id = lr.user_id WHERE {where}"
+        params = params * 2
+    return sql, params
+
+
+def load_approved_intervals(date_from: date, date_to: date,
+                            updated_since: Optional[datetime] = None) -> List[Tuple]:
+    """Approved requests overlapping [date_from, date_to] as tuples
+    (id, role, start_day, end_day, updated_at), dates in days since 1970-01-01.
+
+    With ``updated_since`` only requests changed at or after that time are
+    read (an index range on idx_leave_status_updated), for incremental
+    refreshes; the archive is skipped then, since archived rows were
+    decided long before.
+    """
+    conn = connect_db(readonly=True)
+    try:
+        with conn.cursor(pymysql.cursors.Cursor) as cur:
+            cur.execute(*_approved_intervals_query(date_from, date_to, updated_since))
+            return list(cur.fetchall())
+    finally:
+        conn.close()
+
+
+def load_staffing_inputs(date_from: date, date_to: date,
+                         updated_since: Optional[datetime] = None) -> Tuple[List[Tuple], Dict[str, int]]:
+    """load_approved_intervals plus {role: number of users}, on one connection (staffing.py)"""
+    conn = connect_db(readonly=True)
+    try:
+        with conn.cursor(pymysql.cursors.Cursor) as cur:
+            cur.execute(*_approved_intervals_query(date_from, date_to, updated_since))
+            intervals = list(cur.fetchall())
+            cur.execute(f"SELECT {_DEADLINE} role, COUNT(*) FROM users GROUP BY role")
+            return intervals, dict(cur.fetchall())
+    finally:
+        conn.close()
+
+
+# --------------------------------------------------------------- archive
+
+def archive_closed_requests(cutoff: date, batch_size: int = 500) -> int:
+    """Move up to ``batch_size`` approved/rejected requests that ended before ``cutoff``
+    into the archive table, in one short transaction; returns how many moved.
+
+    Rows are claimed with SKIP LOCKED so the archiver never queues behind
+    reviewers, and the start_date bound lets MySQL read only old partitions.
+    leave_summary is unchanged: archived requests still count.
+    """
+    columns = ', '.join(ARCHIVE_COLUMNS)
+
+    def work(cur):
+        cur.execute("""
+            SELECT id FROM leave_requests
+            WHERE status IN ('approved', 'rejected') AND start_date < %s AND end_date < %s
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        """, (cutoff, cutoff, batch_size))
+        ids = [row['id'] for row in cur.fetchall()]
+        if not ids:
+            return 0
+        placeholders = ', '.join(['%s'] * len(ids))
+        cur.execute(f"""
+            INSERT INTO {ARCHIVE_TABLE} ({columns})
+            SELECT {columns} FROM leave_requests WHERE id IN ({placeholders})
+        """, ids)
+        cur.execute(f"DELETE FROM leave_requests WHERE id IN ({placeholders})", ids)
+        return len(ids)
+
+    return run_transaction(work)
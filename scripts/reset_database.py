@@ -1,20 +1,10 @@
 import pymysql
-from dotenv import load_dotenv
-import os
+from db import DB_NAME, get_db_config
 
 def reset_database():
     try:
-        # Load environment variables
-        load_dotenv()
-        
         # Get database credentials (without database name first)
-        db_config = {
-            'host': os.getenv('DB_HOST', 'localhost'),
-            'user': os.getenv('DB_USER', 'root'),
-            'password': os.getenv('DB_PASSWORD', ''),
-            'charset': 'utf8mb4',
-            'cursorclass': pymysql.cursors.DictCursor
-        }
+        db_config = get_db_config(database=False)
         
         print("Connecting to MySQL server...")
         
@@ -24,7 +14,7 @@ def reset_database():
         try:
             with connection.cursor() as cursor:
                 # Create database if not exists
-                db_name = os.getenv('DB_NAME', 'hr_management')
+                db_name = DB_NAME
                 print(f"Creating database '{db_name}' if it doesn't exist...")
                 cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{db_name}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
                 
@@ -1,20 +1,10 @@
 import pymysql
-from dotenv import load_dotenv
-import os
+from db import DB_NAME, get_db_config
 
 def reset_database():
     try:
-        # Load environment variables
-        load_dotenv()
-        
         # Database configuration (without database name first)
-        db_config = {
-            'host': os.getenv('DB_HOST', 'localhost'),
-            'user': os.getenv('DB_USER', 'root'),
-            'password': os.getenv('DB_PASSWORD', 'mukulinblr#123'),
-            'charset': 'utf8mb4',
-            'cursorclass': pymysql.cursors.DictCursor
-        }
+        db_config = get_db_config(database=False)
         
         print("Connecting to MySQL server...")
         connection = pymysql.connect(**db_config)
@@ -22,7 +12,7 @@ def reset_database():
         try:
             with connection.cursor() as cursor:
                 # Drop database if exists
-                db_name = os.getenv('DB_NAME', 'hr_management')
+                db_name = DB_NAME
                 print(f"Dropping database '{db_name}' if it exists...")
                 cursor.execute(f"DROP DATABASE IF EXISTS `{db_name}`")
                 
@@ -0,0 +1,86 @@
+"""
+Minimum-staffing check for leave approvals.
+
+Approving a request is risky when, on some day, the people of the
+requester's role already on approved leave plus the requester would be
+more than COVERAGE_MAX_AWAY_PCT percent of that role's headcount.
+Only the requester's working days count (holiday_calendar.py): sharing a
+weekend or public holiday with someone else's leave is no risk. The
+per-day counts come from the absence calendar's cached occupancy arrays
+(absence.py) over the next COVERAGE_HORIZON_DAYS, so checking a page of
+requests is a few array slices. update_leave_status adds each approval
+to those arrays as it happens. Role headcounts are read on the same
+connection as each occupancy refresh, and both are trusted for
+COVERAGE_MAX_AGE seconds.
+"""
+import math
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import absence
+import holiday_calendar
+import repository
+
+COVERAGE_MAX_AWAY_PCT = float(os.getenv('COVERAGE_MAX_AWAY_PCT', 20))
+COVERAGE_HORIZON_DAYS = int(os.getenv('COVERAGE_HORIZON_DAYS', 365))
+# Occupancy and headcounts younger than this (seconds) are used without a query
+COVERAGE_MAX_AGE = int(os.getenv('COVERAGE_MAX_AGE', 60))
+
+_headcounts = {'counts': None, 'fetched_at': float('-inf')}
+_headcounts_lock = threading.Lock()
+
+
+def max_away(headcount):
+    """How many people of a role may be away on the same day (at least one)"""
+    return max(1, math.floor(headcount * COVERAGE_MAX_AWAY_PCT / 100))
+
+
+def _load_intervals(date_from, date_to, updated_since=None):
+    """absence.absence_counts loader that refreshes the headcounts on the same connection"""
+    rows, counts = repository.load_staffing_inputs(date_from, date_to, updated_since)
+    with _headcounts_lock:
+        _headcounts.update(counts=counts, fetched_at=time.monotonic())
+    return rows
+
+
+def _role_headcounts():
+    with _headcounts_lock:
+        if time.monotonic() - _headcounts['fetched_at'] < COVERAGE_MAX_AGE:
+            return _headcounts['counts']
+    counts = repository.count_users_by_role()
+    with _headcounts_lock:
+        _headcounts.update(counts=counts, fetched_at=time.monotonic())
+    return counts
+
+
+def coverage_risks(requests, today=None):
+    """{request id: [(day, people away including the requester, limit)]} for every request
+    that would push its role over the limit; requests without risk are left out.
+
+    ``requests`` are rows with id, role, region, start_date and end_date.
+    Only the requester's working days from ``today`` (default: today) to
+    the end of the horizon are checked.
+    """
+    today = today or date.today()
+    date_to = today + timedelta(days=COVERAGE_HORIZON_DAYS - 1)
+    away = absence.absence_counts(today, date_to, max_age=COVERAGE_MAX_AGE, load=_load_intervals)
+    headcounts = _role_headcounts()
+
+    risks = {}
+    for req in requests:
+        first = max((req['start_date'] - today).days, 0)
+        last = min((req['end_date'] - today).days, COVERAGE_HORIZON_DAYS - 1)
+        if last < first or req['role'] not in away:
+            continue
+        limit = max_away(headcounts.get(req['role'], 0))
+        with_candidate = away[req['role']][first:last + 1] + 1
+        days = repository.epoch_day(today) + np.arange(first, last + 1)
+        working = holiday_calendar.calendar_for(req.get('region')).count(days, days) > 0
+        over = np.flatnonzero((with_candidate > limit) & working)
+        if len(over):
+            risks[req['id']] = [(today + timedelta(days=int(first + i)), int(with_candidate[i]), limit)
+                                for i in over]
+    return risks
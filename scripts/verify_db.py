@@ -1,19 +1,10 @@
 import pymysql
-from dotenv import load_dotenv
-import os
+from db import get_db_config
 
 def verify_database():
     try:
-        # Load environment variables
-        load_dotenv()
-        
         # Get database credentials
-        db_config = {
-            'host': os.getenv('DB_HOST', 'localhost'),
-            'user': os.getenv('DB_USER', 'root'),
-            'password': os.getenv('DB_PASSWORD', ''),
-            'database': os.getenv('DB_NAME', 'hr_management')
-        }
+        db_config = get_db_config(cursorclass=pymysql.cursors.Cursor)
         
         print("Connecting to database with config:", {**db_config, 'password': '***'})
         